@@ -1,10 +1,63 @@
+import argparse
+import hashlib
+import json
 import os
 import pickle
 import sqlite3
+import threading
+import time
+import zlib
 from contextlib import closing
 
 from modules import helpers
 
+# Bumped whenever migrate() learns a new step; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
+# Applied to every connection; journal_mode=WAL is persistent and set once by migrate()
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+)
+
+# Section data is stored as JSON text; payloads larger than this many bytes are stored as zlib-compressed JSON blobs
+COMPRESS_THRESHOLD = int(os.getenv("QS_DB_COMPRESS_THRESHOLD", "4096"))
+
+# Statements are kept as constants so each thread's connection reuses its prepared statement cache
+# The update only happens when the content hash or the flags differ, so unchanged saves write nothing
+SQL_UPSERT_SECTION = """INSERT INTO section_data(name, section, validated, user_entered, data, updated_at, content_hash, revision)
+    VALUES (?, ?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'), ?, 1)
+    ON CONFLICT(name, section) DO UPDATE SET
+        validated = excluded.validated,
+        user_entered = excluded.user_entered,
+        data = excluded.data,
+        updated_at = excluded.updated_at,
+        content_hash = excluded.content_hash,
+        revision = section_data.revision + 1
+    WHERE section_data.content_hash IS NOT excluded.content_hash
+        OR section_data.validated IS NOT excluded.validated
+        OR section_data.user_entered IS NOT excluded.user_entered"""
+SQL_SELECT_SECTION = """SELECT validated, user_entered, data from section_data where name == ? AND section == ?"""
+SQL_SELECT_ALL_SECTIONS = """SELECT section, validated, user_entered, data from section_data where name == ?"""
+# Answered from the section_status covering index, the data blobs are never read
+SQL_SELECT_STATUS = """SELECT section, validated, user_entered, updated_at, revision, content_hash
+    from section_data where name == ?"""
+# json_extract only works on the uncompressed (TEXT) rows, compressed ones are decoded in Python
+SQL_SELECT_SECTION_VALUE = """SELECT CASE WHEN typeof(data) == 'text' THEN json_extract(data, ?) END AS value,
+    typeof(data) == 'text' AS is_json, CASE WHEN typeof(data) != 'text' THEN data END AS data
+    from section_data where name == ? AND section == ?"""
+SQL_SELECT_ALL_DATA = """SELECT name, section, data from section_data"""
+SQL_UPDATE_DATA = """UPDATE section_data SET data = ? WHERE name == ? AND section == ?"""
+SQL_DELETE_CONFIG = """DELETE from section_data where name == ?"""
+SQL_DELETE_SECTION = """DELETE from section_data where name == ? AND section == ?"""
+SQL_SELECT_CONFIG_NAMES = """SELECT DISTINCT name FROM section_data ORDER BY name ASC"""
+
+_local = threading.local()
+_migrate_lock = threading.Lock()
+_migrated_path = None
+
 
 def get_database_path():
     return os.path.join(helpers.CONFIG_DIR, "quickstart.sqlite")
@@ -21,61 +74,296 @@ def persisted_section_table_create():
     )"""
 
 
+def content_hash(data):
+    """Stable hash of section data, independent of key order and of how the row is encoded."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")).hexdigest()
+
+
+def encode_data(data):
+    """Serialize section data to JSON text, compressing it when it is larger than COMPRESS_THRESHOLD."""
+    encoded = json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+    if len(encoded) > COMPRESS_THRESHOLD:
+        return zlib.compress(encoded.encode("utf-8"))
+    return encoded
+
+
+def decode_data(raw):
+    """Deserialize section data stored by encode_data(), or a pickle written before schema version 3."""
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return json.loads(raw)
+    if raw[:1] == b"\x80":  # Pickle protocol 2+ marker, zlib streams start with 0x78
+        return pickle.loads(raw)
+    return json.loads(zlib.decompress(raw))
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    connection.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+def add_column(connection, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN, unless the column already exists (e.g. left behind by an interrupted upgrade)."""
+    columns = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def migrate():
+    """Create or upgrade the database schema. Runs once per process, before the first connection is handed out."""
+    global _migrated_path
+
+    path = get_database_path()
+    with _migrate_lock:
+        if _migrated_path == path:
+            return
+
+        with closing(_connect(path)) as connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+
+            # sqlite3 commits DDL on its own in its default mode; manage the transaction explicitly so every
+            # step, and the user_version bump, is applied together or not at all
+            connection.isolation_level = None
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                if version < 1:
+                    connection.execute(persisted_section_table_create())
+                if version < 2:
+                    add_column(connection, "section_data", "updated_at", "TEXT")
+                    connection.execute(
+                        """CREATE INDEX IF NOT EXISTS section_status
+                            ON section_data(name, section, validated, user_entered, updated_at)"""
+                    )
+                if version < 3:
+                    migrate_pickled_data(connection)
+                if version < 4:
+                    add_column(connection, "section_data", "content_hash", "TEXT")
+                    add_column(connection, "section_data", "revision", "INTEGER NOT NULL DEFAULT 1")
+                    for row in connection.execute(SQL_SELECT_ALL_DATA).fetchall():
+                        try:
+                            data_hash = content_hash(decode_data(row["data"]))
+                        except Exception as e:
+                            # Without a hash the next save of this section simply writes it again
+                            print(f"[WARNING] Could not hash stored section '{row['section']}' of config '{row['name']}': {e}")
+                            continue
+                        connection.execute(
+                            "UPDATE section_data SET content_hash = ? WHERE name == ? AND section == ?",
+                            (data_hash, row["name"], row["section"]),
+                        )
+                    connection.execute("DROP INDEX IF EXISTS section_status")
+                    connection.execute(
+                        """CREATE INDEX section_status
+                            ON section_data(name, section, validated, user_entered, updated_at, revision, content_hash)"""
+                    )
+                if version < SCHEMA_VERSION:
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+        _migrated_path = path
+
+
+def migrate_pickled_data(connection):
+    """One-shot conversion of the pickled section data of older databases to (compressed) JSON."""
+    converted = 0
+    for row in connection.execute(SQL_SELECT_ALL_DATA).fetchall():
+        if isinstance(row["data"], bytes) and row["data"][:1] == b"\x80":
+            try:
+                data = pickle.loads(row["data"])
+            except Exception as e:
+                # Leave the row as it is rather than failing the whole upgrade over one damaged section
+                print(f"[WARNING] Could not convert stored section '{row['section']}' of config '{row['name']}': {e}")
+                continue
+            connection.execute(SQL_UPDATE_DATA, (encode_data(data), row["name"], row["section"]))
+            converted += 1
+
+    if converted:
+        print(f"[INFO] Converted {converted} stored section(s) from pickle to JSON.")
+    return converted
+
+
+def get_connection():
+    """Return this thread's connection, opening it on first use (waitress serves each request from a pooled thread)."""
+    path = get_database_path()
+    connection = getattr(_local, "connection", None)
+    if connection is None or _local.path != path:
+        migrate()
+        if connection is not None:
+            connection.close()
+        connection = _connect(path)
+        _local.connection = connection
+        _local.path = path
+    return connection
+
+
 def save_section_data(section, validated, user_entered, data, name="default"):
-    with sqlite3.connect(get_database_path(), detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES) as connection:
-        connection.row_factory = sqlite3.Row
-        with closing(connection.cursor()) as cursor:
-            cursor.execute(persisted_section_table_create())
-            pickled_data = pickle.dumps(data)
-
-            cursor.execute(
-                """INSERT OR IGNORE INTO
-                    section_data(name, section, validated, user_entered, data)
-                    VALUES (?, ?, ?, ?, ?)""",
-                (name, section, validated, user_entered, pickled_data),
-            )
+    """
+    Store a section, bumping its revision. Returns False when the stored content and flags were already
+    identical, in which case nothing was written.
+    """
+    connection = get_connection()
+    with connection:
+        cursor = connection.execute(
+            SQL_UPSERT_SECTION,
+            (name, section, helpers.booler(validated), helpers.booler(user_entered), encode_data(data), content_hash(data)),
+        )
+        return cursor.rowcount > 0
+
 
-            cursor.execute(
-                """UPDATE section_data
-                    SET validated = ?, user_entered = ?, data = ?
-                    WHERE name == ? AND section == ?""",
-                (validated, user_entered, pickled_data, name, section),
+def save_sections_bulk(name, sections):
+    """
+    Store several sections of a config in a single transaction; sections is {section: (validated, user_entered, data)}.
+    Either all sections are stored or none are. Returns the sections that were actually written.
+    """
+    connection = get_connection()
+    written = []
+    with connection:
+        for section, (validated, user_entered, data) in sections.items():
+            cursor = connection.execute(
+                SQL_UPSERT_SECTION,
+                (name, section, helpers.booler(validated), helpers.booler(user_entered), encode_data(data), content_hash(data)),
             )
+            if cursor.rowcount > 0:
+                written.append(section)
+    return written
+
+
+def decode_section_row(row, name, section):
+    """
+    Return (validated, user_entered, data) of a stored row, or None when its data cannot be decoded
+    (e.g. a pickle the upgrade could not convert). Such a section is treated as missing until it is saved again.
+    """
+    decoded, data = try_decode_data(row["data"], name, section)
+    if not decoded:
+        return None
+    return helpers.booler(row["validated"]), helpers.booler(row["user_entered"]), data
+
+
+def try_decode_data(raw, name, section):
+    """Return (True, data), or (False, None) with a warning when the stored data of a section cannot be decoded."""
+    try:
+        return True, decode_data(raw)
+    except Exception as e:
+        print(f"[WARNING] Could not decode stored section '{section}' of config '{name}', treating it as missing: {e}")
+        return False, None
 
 
 def retrieve_section_data(name, section):
-    with sqlite3.connect(get_database_path(), detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES) as connection:
-        connection.row_factory = sqlite3.Row
-        with closing(connection.cursor()) as cursor:
-            cursor.execute(persisted_section_table_create())
-            cursor.execute(
-                """SELECT validated, user_entered, data from section_data where name == ? AND section == ?""",
-                (name, section),
-            )
-            row = cursor.fetchone()
-            if row:
-                return (
-                    helpers.booler(row["validated"]),
-                    helpers.booler(row["user_entered"]),
-                    pickle.loads(row["data"]),
-                )
+    row = get_connection().execute(SQL_SELECT_SECTION, (name, section)).fetchone()
+    if row:
+        decoded = decode_section_row(row, name, section)
+        if decoded is not None:
+            return decoded
     return False, False, None
 
 
+def retrieve_all_section_data(name):
+    """
+    Load every section stored for a config with a single query, as {section: (validated, user_entered, data)}.
+    Each section is decoded on its own, so one undecodable section is left out instead of failing the whole config.
+    """
+    sections = {}
+    for row in get_connection().execute(SQL_SELECT_ALL_SECTIONS, (name,)).fetchall():
+        decoded = decode_section_row(row, name, row["section"])
+        if decoded is not None:
+            sections[row["section"]] = decoded
+    return sections
+
+
+def retrieve_section_value(name, section, path):
+    """
+    Return a single value from a stored section, e.g. path "$.plex.url", without decoding the whole section.
+    Returns None when the section or the value does not exist.
+    """
+    row = get_connection().execute(SQL_SELECT_SECTION_VALUE, (path, name, section)).fetchone()
+    if row is None:
+        return None
+    if row["is_json"]:
+        return row["value"]
+
+    decoded, value = try_decode_data(row["data"], name, section)
+    if not decoded:
+        return None
+    for key in path.lstrip("$.").split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def retrieve_section_status(name):
+    """Return {section: (validated, user_entered)} for a config without loading any section data."""
+    return {
+        row["section"]: (helpers.booler(row["validated"]), helpers.booler(row["user_entered"]))
+        for row in get_connection().execute(SQL_SELECT_STATUS, (name,)).fetchall()
+    }
+
+
+def retrieve_section_progress(name):
+    """
+    Return {section: {"validated", "user_entered", "updated_at", "revision", "content_hash"}} for a config,
+    used to show progress in the navigation.
+    """
+    return {
+        row["section"]: {
+            "validated": helpers.booler(row["validated"]),
+            "user_entered": helpers.booler(row["user_entered"]),
+            "updated_at": row["updated_at"],
+            "revision": row["revision"],
+            "content_hash": row["content_hash"],
+        }
+        for row in get_connection().execute(SQL_SELECT_STATUS, (name,)).fetchall()
+    }
+
+
 def reset_data(name, section=None):
-    with sqlite3.connect(get_database_path(), detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES) as connection:
-        connection.row_factory = sqlite3.Row
-        with closing(connection.cursor()) as cursor:
-            sql = "DELETE from section_data where name == ?"
-            if section:
-                cursor.execute(f"{sql} AND section == ?", (name, section))
-            else:
-                cursor.execute(sql, (name,))
+    connection = get_connection()
+    with connection:
+        if section:
+            connection.execute(SQL_DELETE_SECTION, (name, section))
+        else:
+            connection.execute(SQL_DELETE_CONFIG, (name,))
 
 
 def get_unique_config_names():
-    with sqlite3.connect(get_database_path(), detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES) as connection:
-        connection.row_factory = sqlite3.Row
-        with closing(connection.cursor()) as cursor:
-            cursor.execute("SELECT DISTINCT name FROM section_data ORDER BY name ASC")
-            return [row["name"] for row in cursor.fetchall()]
+    return [row["name"] for row in get_connection().execute(SQL_SELECT_CONFIG_NAMES).fetchall()]
+
+
+def benchmark_encodings(rounds=200):
+    """Compare stored size and decode time of pickle against the (compressed) JSON encoding for every stored section."""
+    rows = [(row["section"], decode_data(row["data"])) for row in get_connection().execute(SQL_SELECT_ALL_DATA).fetchall()]
+    if not rows:
+        print("[INFO] No stored sections to benchmark.")
+        return
+
+    totals = {"pickle": [0, 0.0], "json": [0, 0.0]}
+    for section, data in rows:
+        for encoding, dump, load in (("pickle", pickle.dumps, pickle.loads), ("json", encode_data, decode_data)):
+            raw = dump(data)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                load(raw)
+            totals[encoding][0] += len(raw)
+            totals[encoding][1] += (time.perf_counter() - start) / rounds
+
+    print(f"[INFO] {len(rows)} sections, decode time averaged over {rounds} rounds")
+    for encoding, (size, seconds) in totals.items():
+        print(f"[INFO] {encoding:<6} {size:>10} bytes {seconds * 1000:>10.3f} ms to decode all sections")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quickstart database maintenance")
+    parser.add_argument("--benchmark", action="store_true", help="Compare pickle and JSON size/decode time of the stored sections")
+    args = parser.parse_args()
+
+    # Upgrades the schema and converts pickled data of older databases to JSON
+    migrate()
+    if args.benchmark:
+        benchmark_encodings()
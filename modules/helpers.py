@@ -3,9 +3,10 @@ import json
 import os
 import re
 import sys
+import threading
 from pathlib import Path
 from plexapi.server import PlexServer
-from modules import persistence
+from modules import persistence, version_check
 
 import requests
 from flask import current_app as app
@@ -17,6 +18,9 @@ except ImportError:
 
 
 STRING_FIELDS = {"apikey", "token", "username", "password"}
+# Config keys whose values are redacted from shared configs, on top of STRING_FIELDS and what the schema marks as secret
+SENSITIVE_KEY_PATTERN = re.compile(r".*(token|url|api_*key|secret|error|delete|run_start|run_end|version|changes|username|password)|.*client.*")
+REDACTED = "(redacted)"
 GITHUB_BASE_URL = "https://raw.githubusercontent.com/Kometa-Team/Kometa"
 
 BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
@@ -24,6 +28,7 @@ WORKING_DIR = os.path.dirname(sys.executable) if getattr(sys, "frozen", False) e
 MEIPASS_DIR = sys._MEIPASS if getattr(sys, "frozen", False) else BASE_DIR  # noqa
 
 JSON_SETTINGS = os.path.join(MEIPASS_DIR, "static", "json")
+FONTS_DIR = os.path.join(MEIPASS_DIR, "static", "fonts")
 
 CONFIG_DIR = os.path.join(WORKING_DIR, "config")
 os.makedirs(CONFIG_DIR, exist_ok=True)
@@ -34,6 +39,9 @@ os.makedirs(JSON_SCHEMA_DIR, exist_ok=True)
 HASH_FILE = os.path.join(JSON_SCHEMA_DIR, "file_hashes.txt")
 VERSION_FILE = os.path.join(MEIPASS_DIR, "VERSION")
 
+_pyfiglet_fonts_lock = threading.Lock()
+_pyfiglet_fonts = None
+
 
 def normalize_id(name, existing_ids):
     """Convert library names to safe and unique HTML IDs while preserving Unicode."""
@@ -61,29 +69,24 @@ def is_valid_aspect_ratio(image):
     return abs((width / height) - (2 / 3)) < 0.01  # Ensure it's approximately 1000x1500
 
 
-def extract_library_name(key):
-    """Extracts the actual library name from the key format."""
-    match = re.match(r"(mov|sho)-library_([^-]+(?:-[^-]+)*)-", key)
-    return match.group(2) if match else None
-
-
 def get_pyfiglet_fonts():
-    """Retrieve available PyFiglet fonts from static/fonts, sorted with custom order."""
-    fonts_dir = "static/fonts"
+    """Retrieve available PyFiglet fonts from the bundled static/fonts, sorted with custom order. Listed once per process."""
+    global _pyfiglet_fonts
 
-    # Ensure predefined fonts are at the top
-    predefined_fonts = ["none", "single line", "standard"]
-    fonts = set(predefined_fonts)  # Using set to prevent duplicates
+    with _pyfiglet_fonts_lock:
+        if _pyfiglet_fonts is None:
+            # Ensure predefined fonts are at the top
+            predefined_fonts = ["none", "single line", "standard"]
+            fonts = set(predefined_fonts)  # Using set to prevent duplicates
 
-    # Append all .flf files, removing extension
-    if os.path.exists(fonts_dir):
-        fonts.update(f.replace(".flf", "") for f in os.listdir(fonts_dir) if f.endswith(".flf"))
+            # Append all .flf files, removing extension
+            if os.path.exists(FONTS_DIR):
+                fonts.update(f.replace(".flf", "") for f in os.listdir(FONTS_DIR) if f.endswith(".flf"))
 
-    # Sort remaining fonts (excluding predefined ones)
-    sorted_fonts = sorted(fonts - set(predefined_fonts))
+            # Combine predefined fonts with sorted remaining fonts
+            _pyfiglet_fonts = predefined_fonts + sorted(fonts - set(predefined_fonts))
 
-    # Combine predefined fonts with sorted remaining fonts
-    return predefined_fonts + sorted_fonts
+    return list(_pyfiglet_fonts)
 
 
 def calculate_hash(content):
@@ -111,55 +114,6 @@ def save_hashes(hashes):
             f.write(f"{filename}:{file_hash}\n")
 
 
-def ensure_json_schema():
-    """Ensure json-schema files exist and are up-to-date based on hash checks."""
-    # branch = get_kometa_branch()
-    branch = "nightly"
-
-    previous_hashes = load_previous_hashes()
-    new_hashes = {}
-
-    for filename, url in [
-        (
-            "prototype_config.yml",
-            f"{GITHUB_BASE_URL}/{branch}/json-schema/prototype_config.yml",
-        ),
-        (
-            "config-schema.json",
-            f"{GITHUB_BASE_URL}/{branch}/json-schema/config-schema.json",
-        ),
-        (
-            "config.yml.template",
-            f"{GITHUB_BASE_URL}/{branch}/config/config.yml.template",
-        ),
-    ]:
-        file_path = os.path.join(JSON_SCHEMA_DIR, filename)  # Store everything in json-schema
-
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            new_content = response.text
-            new_hash = calculate_hash(new_content)
-
-            # Compare hash with previous version
-            if filename in previous_hashes and previous_hashes[filename] == new_hash:
-                new_hashes[filename] = new_hash  # Keep existing hash
-                continue
-
-            # Save the new file if hash has changed
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(new_content)
-
-            new_hashes[filename] = new_hash
-
-        except requests.RequestException as e:
-            print(f"[ERROR] Failed to download {filename} from {url}: {e}")
-            continue  # Skip to the next file
-
-    # Save updated hashes
-    save_hashes(new_hashes)
-
-
 def get_remote_version(branch):
     """Fetch the latest VERSION file from the correct GitHub branch."""
     url = f"https://raw.githubusercontent.com/Kometa-Team/Quickstart/{branch}/VERSION"
@@ -190,7 +144,7 @@ def get_branch():
 
 def get_kometa_branch():
     """Fetch the correct branch (master or nightly)."""
-    version_info = check_for_update()
+    version_info = version_check.get_version_info()
     return version_info.get("kometa_branch", "nightly")  # Default to nightly branch
 
 
@@ -202,11 +156,12 @@ def get_version():
     return "unknown"
 
 
-def check_for_update():
+def check_for_update(check_remote=True):
     """Compare the local version with the remote version and determine Kometa branch."""
     local_version = get_version()
     branch = get_branch()
-    remote_version = get_remote_version(branch)
+    # Skip the GitHub round trip when only the local details are needed
+    remote_version = get_remote_version(branch) if check_remote else None
 
     update_available = remote_version and remote_version != local_version
 
@@ -452,25 +407,38 @@ def get_template_list():
     return templates
 
 
-def redact_sensitive_data(yaml_content):
-    import re
+def is_sensitive_key(key, sensitive_keys=frozenset()):
+    """Return True when the value of this config key must not be shared."""
+    return key in STRING_FIELDS or key in sensitive_keys or bool(SENSITIVE_KEY_PATTERN.fullmatch(str(key)))
 
-    # Split the YAML content into lines for line-by-line processing
-    lines = yaml_content.splitlines()
 
-    # Process each line to redact sensitive data
-    redacted_lines = [
-        re.sub(
-            r"(token|client.*|url|api_*key|secret|error|delete|run_start|run_end|version|changes|username|password): .+",
-            r"\1: (redacted)",
-            line.strip("\r\n"),
-        )
-        for line in lines
-    ]
+def redact_subtree(data):
+    """Return a copy of a config subtree with every scalar value replaced by REDACTED."""
+    if isinstance(data, dict):
+        return {key: redact_subtree(value) for key, value in data.items()}
+    elif isinstance(data, list):
+        return [redact_subtree(value) for value in data]
+    return REDACTED if data is not None else None
 
-    # Join the lines back together to form the redacted YAML content
-    redacted_content = "\n".join(redacted_lines)
-    return redacted_content
+
+def redact_sensitive_data(data, sensitive_keys=frozenset()):
+    """
+    Return a copy of a config tree with the values of sensitive keys replaced by REDACTED; when a sensitive key
+    holds a list or mapping (e.g. webhook URLs), every scalar below it is redacted.
+    Subtrees without sensitive values are returned as-is, so unchanged sections keep their identity.
+    """
+    if isinstance(data, dict):
+        redacted = {}
+        for key, value in data.items():
+            if value is not None and is_sensitive_key(key, sensitive_keys):
+                redacted[key] = redact_subtree(value)
+            else:
+                redacted[key] = redact_sensitive_data(value, sensitive_keys)
+        return redacted if any(redacted[key] is not value for key, value in data.items()) else data
+    elif isinstance(data, list):
+        redacted = [redact_sensitive_data(value, sensitive_keys) for value in data]
+        return redacted if any(new is not old for new, old in zip(redacted, data)) else data
+    return data
 
 
 def update_env_variable(key, value):
@@ -500,8 +468,8 @@ def load_quickstart_sections():
 
 
 def get_top_imdb_items(library_id, media_type, placeholder_id=None):
-    print(f"[DEBUG] Fetching Plex credentials for '010-plex'")
-    plex_url, plex_token = persistence.get_stored_plex_credentials("010-plex")
+    print(f"[DEBUG] Fetching stored Plex credentials")
+    plex_url, plex_token = persistence.get_stored_plex_credentials()
 
     print(f"[DEBUG] Connecting to Plex with URL: {plex_url}")
     plex = PlexServer(plex_url, plex_token)
@@ -0,0 +1,189 @@
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+# Pillow releases the GIL while decoding, resizing and encoding, so a few dedicated threads keep the CPUs busy
+# without tying up waitress' request threads
+IMAGE_WORKERS = int(os.getenv("QS_IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Jobs queued or running at once; further requests are turned away instead of piling up behind them
+IMAGE_QUEUE_DEPTH = int(os.getenv("QS_IMAGE_QUEUE_DEPTH", "16"))
+# Seconds a request waits for its job before giving up
+IMAGE_JOB_TIMEOUT = int(os.getenv("QS_IMAGE_JOB_TIMEOUT", "60"))
+# Keys whose newest sequence is remembered after their jobs finished, least recently submitted ones are forgotten first
+LATEST_KEYS_SIZE = 1024
+
+
+class QueueFull(Exception):
+    """Raised when IMAGE_QUEUE_DEPTH image jobs are already queued or running."""
+
+
+class Superseded(Exception):
+    """Raised when a newer job with the same key replaced this one."""
+
+
+_lock = threading.Lock()
+_slot_free = threading.Condition(_lock)
+_executor = None
+_pending = 0
+_sequence = itertools.count(1)
+_latest = {}  # job key -> [sequence, future] of the newest unfinished job with that key, used to cancel it
+_newest_sequences = OrderedDict()  # job key -> sequence of the newest job submitted with that key, finished or not
+_shared = {}  # job key -> future of the unfinished shared job with that key
+_metrics = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "superseded": 0,
+    "queue_seconds": 0.0,
+    "render_seconds": 0.0,
+    "max_queue_seconds": 0.0,
+    "max_render_seconds": 0.0,
+}
+
+
+def get_executor():
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-worker")
+        return _executor
+
+
+def _finished(key, sequence, future):
+    global _pending
+
+    with _lock:
+        _pending -= 1
+        _slot_free.notify()
+        # Forget finished keys so one-off keys (e.g. deleted libraries) do not pile up
+        if key is not None:
+            latest = _latest.get(key)
+            if latest is not None and latest[0] == sequence:
+                del _latest[key]
+            if _shared.get(key) is future:
+                del _shared[key]
+
+
+class ImageJob:
+    """A job submitted to the image executor; result() waits for it and records its queue and render time."""
+
+    __slots__ = ("key", "sequence", "future")
+
+    def __init__(self, key, sequence, future):
+        self.key = key
+        self.sequence = sequence
+        self.future = future
+
+    def result(self):
+        try:
+            result, queue_seconds, render_seconds = self.future.result(timeout=IMAGE_JOB_TIMEOUT)
+        except CancelledError:
+            with _lock:
+                _metrics["superseded"] += 1
+            raise Superseded(self.key)
+        except Exception:
+            with _lock:
+                _metrics["failed"] += 1
+            raise
+
+        with _lock:
+            # Compared against the newest submission rather than _latest, which forgets a newer job once it
+            # finished, so a slow older job still loses to a faster newer one
+            newest = _newest_sequences.get(self.key, self.sequence) if self.key is not None else self.sequence
+            stale = newest != self.sequence
+            _metrics["completed"] += 1
+            _metrics["queue_seconds"] += queue_seconds
+            _metrics["render_seconds"] += render_seconds
+            _metrics["max_queue_seconds"] = max(_metrics["max_queue_seconds"], queue_seconds)
+            _metrics["max_render_seconds"] = max(_metrics["max_render_seconds"], render_seconds)
+            if stale:
+                _metrics["superseded"] += 1
+
+        if stale:
+            raise Superseded(self.key)
+        return result
+
+
+def submit(fn, *args, key=None, shared=False, wait=False, timeout=None):
+    """
+    Queue an image job on the image executor and return its ImageJob without waiting for it.
+    Jobs sharing a key (e.g. the previews of one library) follow "latest request wins": a newer job cancels
+    the older one if it has not started yet, and the older caller gets Superseded instead of a stale result.
+    With shared=True, identical jobs are coalesced instead: while a job with the same key is queued or running,
+    the caller waits for that job rather than queueing another one.
+    Raises QueueFull when IMAGE_QUEUE_DEPTH jobs are already queued or running, unless wait is set: then it waits
+    up to timeout seconds (IMAGE_JOB_TIMEOUT by default) for a slot to free up first.
+    """
+    global _pending
+
+    with _lock:
+        if shared and key in _shared:
+            return ImageJob(None, None, _shared[key])
+        if wait:
+            _slot_free.wait_for(lambda: _pending < IMAGE_QUEUE_DEPTH, timeout=IMAGE_JOB_TIMEOUT if timeout is None else timeout)
+        if _pending >= IMAGE_QUEUE_DEPTH:
+            _metrics["rejected"] += 1
+            raise QueueFull(f"{_pending} image jobs are already queued")
+        _pending += 1
+        _metrics["submitted"] += 1
+        sequence = next(_sequence)
+        previous = _latest.get(key) if key is not None and not shared else None
+        if key is not None and not shared:
+            _latest[key] = [sequence, None]
+            _newest_sequences[key] = sequence
+            _newest_sequences.move_to_end(key)
+            while len(_newest_sequences) > LATEST_KEYS_SIZE:
+                _newest_sequences.popitem(last=False)
+
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        result = fn(*args)
+        return result, started - submitted, time.perf_counter() - started
+
+    future = get_executor().submit(job)
+    future.add_done_callback(functools.partial(_finished, key, sequence))
+
+    if key is not None and shared:
+        with _lock:
+            # The job may already be done, in which case _finished has nothing to forget
+            if not future.done():
+                _shared[key] = future
+        return ImageJob(None, sequence, future)
+
+    if key is not None:
+        with _lock:
+            latest = _latest.get(key)
+            if latest is not None and latest[0] == sequence:
+                latest[1] = future
+            elif latest is not None:
+                future.cancel()  # An even newer job came in while this one was being submitted
+        if previous is not None and previous[1] is not None:
+            previous[1].cancel()  # Only succeeds while the older job is still queued
+
+    return ImageJob(key, sequence, future)
+
+
+def run(fn, *args, key=None, shared=False):
+    """Run an image job on the image executor and wait for its result; see submit."""
+    return submit(fn, *args, key=key, shared=shared).result()
+
+
+def get_metrics():
+    """Return the executor counters, with average queue and render times in milliseconds."""
+    with _lock:
+        metrics = dict(_metrics, pending=_pending, workers=IMAGE_WORKERS, queue_depth=IMAGE_QUEUE_DEPTH)
+
+    completed = metrics["completed"] or 1
+    metrics["avg_queue_ms"] = round(metrics.pop("queue_seconds") / completed * 1000, 2)
+    metrics["avg_render_ms"] = round(metrics.pop("render_seconds") / completed * 1000, 2)
+    metrics["max_queue_ms"] = round(metrics.pop("max_queue_seconds") * 1000, 2)
+    metrics["max_render_ms"] = round(metrics.pop("max_render_seconds") * 1000, 2)
+    return metrics
@@ -1,38 +1,29 @@
 import csv
 import io
+import json
+import os
+import threading
+from datetime import datetime
 
 import requests
 
+from modules import helpers
+
 _country_url = "https://raw.githubusercontent.com/datasets/country-codes/refs/heads/main/data/country-codes.csv"
 _language_url = "https://raw.githubusercontent.com/datasets/language-codes/refs/heads/main/data/language-codes-full.csv"
-_tag_url = "https://raw.githubusercontent.com/datasets/language-codes/refs/heads/main/data/ietf-language-tags.csv"
-
-
-def _read_csv(url):
-    response = requests.get(url)
-    csv_file = io.StringIO(response.text)
-    return list(csv.reader(csv_file))
 
-
-_tag_dict = {}
-for c in _read_csv(_tag_url):
-    if c[1] not in _tag_dict:
-        _tag_dict[c[1]] = []
-    if c[0] not in _tag_dict[c[1]]:
-        _tag_dict[c[1]].append(c[0])
+SNAPSHOT_FILE = "iso_codes.json"
+REFRESH_TIMEOUT = 10
 
 
 class Country:
+    __slots__ = ("alpha2", "alpha3", "name", "formal")
 
-    def __init__(self, data):
-        self.alpha3 = data[2]
-        self.alpha2 = data[9]
-        self.formal = data[38]
-        self.name = data[40]
-        self.region = data[43]
-        self.subregion = data[45]
-        self.continent = data[49]
-        self.languages = data[51].split(",")
+    def __init__(self, alpha2, alpha3, name, formal=None):
+        self.alpha2 = alpha2
+        self.alpha3 = alpha3
+        self.name = name
+        self.formal = formal or name
 
     def __str__(self):
         return self.name
@@ -52,20 +43,18 @@ class Country:
                 self.alpha3.lower(),
             ]
 
+    def __hash__(self):
+        return hash(self.name)
+
 
 class Languages:
+    __slots__ = ("alpha2", "alpha3", "names", "name")
 
-    def __init__(self, data):
-        self.alpha3 = data[0]
-        self.alpha2 = data[2] if data[2] else None
-        self.names = data[3].split("; ")
+    def __init__(self, alpha2, alpha3, names):
+        self.alpha3 = alpha3
+        self.alpha2 = alpha2 or None
+        self.names = names
         self.name = self.names[0]
-        if self.alpha2 in _tag_dict:
-            self.tags = _tag_dict[self.alpha2]
-        elif self.alpha3 in _tag_dict:
-            self.tags = _tag_dict[self.alpha3]
-        else:
-            self.tags = []
 
     def __str__(self):
         return self.name
@@ -74,34 +63,211 @@ class Languages:
         return self.__str__()
 
     def __eq__(self, other):
-        if isinstance(other, Country):
+        if isinstance(other, Languages):
             return self.name == other.name
         else:
             return str(other) in self.names + [
                 self.alpha2,
                 self.alpha3,
-                self.alpha2.lower(),
+                self.alpha2.lower() if self.alpha2 else None,
                 self.alpha3.lower(),
             ]
 
+    def __hash__(self):
+        return hash(self.name)
+
+
+class Snapshot:
+    """An immutable, indexed copy of the ISO 3166-1 and ISO 639 datasets."""
+
+    __slots__ = (
+        "version",
+        "countries",
+        "languages",
+        "countries_by_alpha2",
+        "countries_by_alpha3",
+        "countries_by_name",
+        "languages_by_alpha2",
+        "languages_by_alpha3",
+        "languages_by_name",
+        "option_lists",
+        "option_payloads",
+    )
+
+    def __init__(self, version, countries, languages):
+        self.version = version
+        self.countries = tuple(countries)
+        self.languages = tuple(languages)
+
+        self.countries_by_alpha2 = {c.alpha2: c for c in self.countries}
+        self.countries_by_alpha3 = {c.alpha3: c for c in self.countries}
+        self.countries_by_name = {c.name: c for c in self.countries}
+
+        self.languages_by_alpha2 = {la.alpha2: la for la in self.languages if la.alpha2}
+        self.languages_by_alpha3 = {la.alpha3: la for la in self.languages}
+        self.languages_by_name = {}
+        for la in self.languages:
+            for name in la.names:
+                self.languages_by_name.setdefault(name, la)
+
+        # (code, name) pairs for the <select> options in the wizard, sorted the way the templates show them
+        self.option_lists = {
+            "iso_639_1_languages": [(la.alpha2, la.name) for la in self.languages if la.alpha2],
+            "iso_3166_1_regions": sorted(((c.alpha2, c.name) for c in self.countries), key=lambda option: option[1]),
+            "iso_639_2_languages": sorted(((la.alpha3, la.name) for la in self.languages), key=lambda option: option[1]),
+        }
+        self.option_payloads = {}
+        for list_name, options in self.option_lists.items():
+            body = json.dumps({"version": self.version, "options": options}, ensure_ascii=False, separators=(",", ":"))
+            self.option_payloads[list_name] = (body, helpers.calculate_hash(body))
+
+    def to_json(self):
+        return {
+            "version": self.version,
+            "countries": [{"alpha2": c.alpha2, "alpha3": c.alpha3, "name": c.name, "formal": c.formal} for c in self.countries],
+            "languages": [{"alpha2": la.alpha2, "alpha3": la.alpha3, "names": la.names} for la in self.languages],
+        }
+
+
+_lock = threading.Lock()
+_snapshot = None
+_refresh_thread = None
+
+
+def _snapshot_from_json(raw):
+    countries = [Country(c["alpha2"], c["alpha3"], c["name"], c.get("formal")) for c in raw["countries"]]
+    languages = [Languages(la.get("alpha2"), la["alpha3"], la["names"]) for la in raw["languages"]]
+    return Snapshot(raw["version"], countries, languages)
+
+
+def _load_snapshot_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return _snapshot_from_json(json.load(f))
+
+
+def _refreshed_snapshot_path():
+    # Refreshed copies live next to the user's config; the bundled one ships in static/json
+    return os.path.join(helpers.CONFIG_DIR, SNAPSHOT_FILE)
+
+
+def _load_snapshot():
+    """Prefer a refreshed snapshot from the config dir when it is newer than the bundled one."""
+    snapshot = _load_snapshot_file(os.path.join(helpers.JSON_SETTINGS, SNAPSHOT_FILE))
+
+    refreshed_path = _refreshed_snapshot_path()
+    if os.path.exists(refreshed_path):
+        try:
+            refreshed = _load_snapshot_file(refreshed_path)
+            if refreshed.version > snapshot.version:
+                snapshot = refreshed
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[WARNING] Ignoring unreadable ISO snapshot {refreshed_path}: {e}")
+
+    return snapshot
+
+
+def get_snapshot():
+    """Return the current snapshot, loading it on first use."""
+    global _snapshot
+
+    snapshot = _snapshot
+    if snapshot is None:
+        with _lock:
+            if _snapshot is None:
+                _snapshot = _load_snapshot()
+            snapshot = _snapshot
+    return snapshot
+
+
+def get_countries():
+    return get_snapshot().countries
+
+
+def get_languages():
+    return get_snapshot().languages
+
+
+def _read_csv(url):
+    response = requests.get(url, timeout=REFRESH_TIMEOUT)
+    response.raise_for_status()
+    return list(csv.reader(io.StringIO(response.text)))
+
+
+def _snapshot_from_remote():
+    """Build a snapshot from the upstream datasets CSV files (header rows are skipped)."""
+    countries = []
+    for c in _read_csv(_country_url)[1:]:
+        if c[9] and c[2] and c[40]:
+            countries.append(Country(c[9], c[2], c[40], c[38]))
+
+    languages = []
+    for c in _read_csv(_language_url)[1:]:
+        if c[0] and c[3]:
+            languages.append(Languages(c[2], c[0], c[3].split("; ")))
+
+    return Snapshot(datetime.now().strftime("%Y.%m.%d"), countries, languages)
+
+
+def refresh_snapshot():
+    """Download the upstream datasets and atomically swap them in as the current snapshot."""
+    global _snapshot
+
+    snapshot = _snapshot_from_remote()
+
+    refreshed_path = _refreshed_snapshot_path()
+    temp_path = f"{refreshed_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot.to_json(), f, ensure_ascii=False)
+    os.replace(temp_path, refreshed_path)
+
+    with _lock:
+        _snapshot = snapshot
+
+    return snapshot
+
+
+def _refresh_in_background():
+    try:
+        snapshot = refresh_snapshot()
+        print(f"[INFO] ISO datasets refreshed (version {snapshot.version}).")
+    except Exception as e:
+        print(f"[WARNING] Failed to refresh ISO datasets, keeping the bundled snapshot: {e}")
+
+
+def start_background_refresh():
+    """Refresh the ISO datasets from GitHub once, without blocking startup."""
+    global _refresh_thread
 
-countries = [Country(c) for c in _read_csv(_country_url)]
-languages = [Languages(c) for c in _read_csv(_language_url)]
+    with _lock:
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=_refresh_in_background, name="iso-refresh", daemon=True)
+            _refresh_thread.start()
+        return _refresh_thread
 
 
 def get_country(name=None, alpha2=None, alpha3=None):
     if all(x is None for x in [name, alpha2, alpha3]):
         raise ValueError("Either name, alpha2, or alpha3 is required")
-    for country in countries:
-        if name == country.name or str(alpha2).upper() == country.alpha2 or str(alpha3).upper() == country.alpha3:
-            return country
+    snapshot = get_snapshot()
+    country = (
+        snapshot.countries_by_name.get(name)
+        or snapshot.countries_by_alpha2.get(str(alpha2).upper())
+        or snapshot.countries_by_alpha3.get(str(alpha3).upper())
+    )
+    if country:
+        return country
     raise NameError("No Country found")
 
 
 def get_language(name=None, alpha2=None, alpha3=None):
     if all(x is None for x in [name, alpha2, alpha3]):
         raise ValueError("Either name, alpha2, or alpha3 is required")
-    for language in languages:
-        if name in language.names or str(alpha2).lower() == language.alpha2 or str(alpha3).lower() == language.alpha3:
-            return language
+    snapshot = get_snapshot()
+    language = (
+        snapshot.languages_by_name.get(name)
+        or snapshot.languages_by_alpha2.get(str(alpha2).lower())
+        or snapshot.languages_by_alpha3.get(str(alpha3).lower())
+    )
+    if language:
+        return language
     raise NameError("No Language found")
@@ -0,0 +1,519 @@
+import argparse
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from ruamel.yaml.comments import CommentedSeq
+
+# Simple operations copied as-is when set
+OPERATION_FLAGS = (
+    "assets_for_all",
+    "mass_imdb_parental_labels",
+    "mass_collection_mode",
+    "update_blank_track_titles",
+    "remove_title_parentheses",
+    "split_duplicates",
+    "radarr_add_all",
+    "sonarr_add_all",
+)
+
+DELETE_COLLECTIONS_FIELDS = (
+    "delete_collections_configured",
+    "delete_collections_managed",
+    "delete_collections_less",
+    "delete_collections_ignore_empty_smart_collections",
+)
+
+# Mass update operations built from a sortable source list plus a custom list or custom string
+GROUPED_OPERATIONS = (
+    "mass_content_rating_update",
+    "mass_original_title_update",
+    "mass_studio_update",
+    "mass_tagline_update",
+    "mass_originally_available_update",
+    "mass_added_at_update",
+    "mass_audience_rating_update",
+    "mass_critic_rating_update",
+    "mass_user_rating_update",
+    "mass_episode_audience_rating_update",
+    "mass_episode_critic_rating_update",
+    "mass_episode_user_rating_update",
+    "mass_background_update",
+    "mass_poster_update",
+    "radarr_remove_by_tag",
+    "sonarr_remove_by_tag",
+)
+
+# Rating operations whose custom string is a number
+RATING_OPERATIONS = (
+    "mass_critic_rating_update",
+    "mass_user_rating_update",
+    "mass_audience_rating_update",
+    "mass_episode_critic_rating_update",
+    "mass_episode_user_rating_update",
+    "mass_episode_audience_rating_update",
+)
+
+POSTER_FIELDS = ("seasons", "episodes", "ignore_locked", "ignore_overlays", "source")
+BACKGROUND_FIELDS = ("seasons", "episodes", "ignore_locked", "source")
+
+# Order of the operations as per the Kometa Wiki; unknown operations follow in the order they were added
+OPERATIONS_ORDER = (
+    "assets_for_all",
+    "delete_collections",
+    "mass_genre_update",
+    "mass_content_rating_update",
+    "mass_original_title_update",
+    "mass_studio_update",
+    "mass_originally_available_update",
+    "mass_added_at_update",
+    "mass_audience_rating_update",
+    "mass_critic_rating_update",
+    "mass_user_rating_update",
+    "mass_episode_audience_rating_update",
+    "mass_episode_critic_rating_update",
+    "mass_episode_user_rating_update",
+    "mass_poster_update",
+    "mass_background_update",
+    "mass_imdb_parental_labels",
+    "mass_collection_mode",
+    "update_blank_track_titles",
+    "remove_title_parentheses",
+    "split_duplicates",
+    "radarr_add_all",
+    "radarr_remove_by_tag",
+    "sonarr_add_all",
+    "sonarr_remove_by_tag",
+    "genre_mapper",
+    "content_rating_mapper",
+    "metadata_backup",
+)
+
+
+# `mov-library_<library id>-<kind>_<field>`; the library id may contain dashes, the kind/field part never does
+LIBRARY_KEY_PATTERN = re.compile(r"^(mov|sho)-library_(.+)-([^-]+)$")
+LIBRARY_KEY_KINDS = ("collection_", "overlay_", "attribute_", "top_level_")
+
+
+def parse_library_keys(flat_data):
+    """
+    Parse the flat library form keys in a single pass, e.g.
+    `mov-library_movies-overlay_ribbon` -> {"mov": {"movies": {"overlay": {"ribbon": value}}}}.
+    The `-library` checkbox becomes {"library": {"title": value}} and
+    `-template_variables[language]` becomes {"template_variables": {"[language]": value}}.
+    Keys that do not follow the pattern are ignored.
+    """
+    parsed = {}
+    for key, value in flat_data.items():
+        match = LIBRARY_KEY_PATTERN.match(key)
+        if not match:
+            continue
+        library_type, lib_id, rest = match.groups()
+
+        if rest == "library":
+            kind, field = "library", "title"
+        elif rest.startswith("template_variables"):
+            kind, field = "template_variables", rest[len("template_variables") :]
+        else:
+            for prefix in LIBRARY_KEY_KINDS:
+                if rest.startswith(prefix):
+                    kind, field = prefix[:-1], rest[len(prefix) :]
+                    break
+            else:
+                continue
+
+        parsed.setdefault(library_type, {}).setdefault(lib_id, {}).setdefault(kind, {})[field] = value
+    return parsed
+
+
+def is_set(value):
+    return value not in [None, "", False]
+
+
+def decode_json(value, description):
+    """Decode a JSON string stored by the wizard's hidden inputs, returning None when it is invalid."""
+    try:
+        return json.loads(value)
+    except Exception as e:
+        print(f"[DEBUG] Skipping invalid JSON in {description}: {value} — {e}")
+        return None
+
+
+def block_seq(values):
+    seq = CommentedSeq(values)
+    seq.fa.set_block_style()  # ensures YAML list style
+    return seq
+
+
+def parse_grouped_operation(attributes, op):
+    """Collect the values of a grouped mass update: the ordered sources, then the custom list or custom string."""
+    op_values = []
+
+    # 1. Ordered source list (sortable)
+    order_value = attributes.get(f"{op}_order")
+    if order_value:
+        parsed = decode_json(order_value, f"{op}_order")
+        if isinstance(parsed, list):
+            for item in parsed:
+                if isinstance(item, (int, float)):
+                    op_values.append(item)
+                elif isinstance(item, str) and item.strip():
+                    # Preserve valid date strings (e.g. "2023-01-01")
+                    op_values.append(item.strip())
+
+    # 2. Custom list (JSON array from UI)
+    custom_list_value = attributes.get(f"{op}_custom")
+    custom_string_key = f"{op}_custom_string"
+    if custom_list_value:
+        parsed_custom = decode_json(custom_list_value, f"{op}_custom")
+        if isinstance(parsed_custom, list):
+            for item in parsed_custom:
+                if isinstance(item, (int, float)):
+                    op_values.append(item)
+                elif isinstance(item, str) and item.strip():
+                    op_values.append(item.strip())
+
+    # 3. Fallback to single custom string (if defined)
+    elif custom_string_key in attributes:
+        raw_value = attributes.get(custom_string_key)
+        if isinstance(raw_value, str) and raw_value.strip():
+            if op in RATING_OPERATIONS:
+                try:
+                    op_values.append(float(raw_value.strip()))
+                except ValueError:
+                    pass  # Invalid float, skip
+            else:
+                op_values.append(raw_value.strip())
+        elif isinstance(raw_value, (int, float)):
+            op_values.append(raw_value)
+
+    return op_values
+
+
+@dataclass(slots=True)
+class TemplateVariables:
+    use_separator: bool = False
+    sep_style: Any = None
+    placeholder_imdb_id: Any = None
+    language: Any = None
+
+    @classmethod
+    def from_form(cls, template_data, attributes):
+        sep_color = template_data.get("[use_separator]")
+        return cls(
+            use_separator=bool(sep_color),
+            sep_style=sep_color or None,
+            placeholder_imdb_id=attributes.get("template_variables[placeholder_imdb_id]") or None,
+            language=template_data.get("[language]") or None,
+        )
+
+    def to_kometa(self):
+        template_vars = {"use_separator": self.use_separator}
+        if self.sep_style:
+            template_vars["sep_style"] = self.sep_style
+        if self.placeholder_imdb_id:
+            template_vars["placeholder_imdb_id"] = self.placeholder_imdb_id
+        if self.language:
+            template_vars["language"] = self.language
+        return template_vars
+
+
+@dataclass(slots=True)
+class MetadataBackup:
+    path: Any = None
+    exclude: list = field(default_factory=list)
+    sync_tags: bool = False
+    add_blank_entries: bool = False
+
+    @classmethod
+    def from_form(cls, attributes):
+        exclude = []
+        val = attributes.get("metadata_backup_exclude")
+        if val:
+            parsed = decode_json(val, "exclude value") if isinstance(val, str) else val
+            if isinstance(parsed, list):
+                exclude = parsed
+
+        return cls(
+            path=attributes.get("metadata_backup_path") or None,
+            exclude=exclude,
+            sync_tags=attributes.get("sync_tags") is True,
+            add_blank_entries=attributes.get("add_blank_entries") is True,
+        )
+
+    def to_kometa(self):
+        backup = {}
+        if self.path:
+            backup["path"] = self.path
+        if self.exclude:  # non-empty list only
+            backup["exclude"] = self.exclude
+        if self.sync_tags:
+            backup["sync_tags"] = True
+        if self.add_blank_entries:
+            backup["add_blank_entries"] = True
+        return backup
+
+
+@dataclass(slots=True)
+class Operations:
+    """The operations block of a library; every field is named after the Kometa operation it is written as."""
+
+    # OPERATION_FLAGS, copied as-is when set
+    assets_for_all: Any = None
+    mass_imdb_parental_labels: Any = None
+    mass_collection_mode: Any = None
+    update_blank_track_titles: Any = None
+    remove_title_parentheses: Any = None
+    split_duplicates: Any = None
+    radarr_add_all: Any = None
+    sonarr_add_all: Any = None
+
+    delete_collections: dict = field(default_factory=dict)
+    mass_genre_update: list = field(default_factory=list)
+
+    # GROUPED_OPERATIONS, the ordered sources and custom values
+    mass_content_rating_update: list = field(default_factory=list)
+    mass_original_title_update: list = field(default_factory=list)
+    mass_studio_update: list = field(default_factory=list)
+    mass_tagline_update: list = field(default_factory=list)
+    mass_originally_available_update: list = field(default_factory=list)
+    mass_added_at_update: list = field(default_factory=list)
+    mass_audience_rating_update: list = field(default_factory=list)
+    mass_critic_rating_update: list = field(default_factory=list)
+    mass_user_rating_update: list = field(default_factory=list)
+    mass_episode_audience_rating_update: list = field(default_factory=list)
+    mass_episode_critic_rating_update: list = field(default_factory=list)
+    mass_episode_user_rating_update: list = field(default_factory=list)
+    mass_background_update: list = field(default_factory=list)
+    mass_poster_update: list = field(default_factory=list)
+    radarr_remove_by_tag: list = field(default_factory=list)
+    sonarr_remove_by_tag: list = field(default_factory=list)
+
+    # Detailed poster/background settings (POSTER_FIELDS, BACKGROUND_FIELDS); they replace the plain source lists
+    mass_poster_details: dict = field(default_factory=dict)
+    mass_background_details: dict = field(default_factory=dict)
+
+    genre_mapper: dict = field(default_factory=dict)
+    content_rating_mapper: dict = field(default_factory=dict)
+    metadata_backup: MetadataBackup = field(default_factory=MetadataBackup)
+
+    @classmethod
+    def from_form(cls, attributes):
+        operations = cls()
+
+        # Mass genre update: the reordered sources, then the custom genre strings as one flow-style list
+        order_value = attributes.get("mass_genre_update_order")
+        if order_value:
+            parsed = decode_json(order_value, "custom genre")
+            if isinstance(parsed, list):
+                for item in parsed:
+                    if isinstance(item, str) and item.startswith("[") and item.endswith("]"):
+                        # Probably malformed nested list — skip
+                        continue
+                    elif isinstance(item, str):
+                        operations.mass_genre_update.append(item)
+                    elif isinstance(item, list):  # rare case
+                        operations.mass_genre_update.extend(item)
+
+        custom_strings_value = attributes.get("mass_genre_update_custom")
+        if custom_strings_value:
+            parsed_custom = decode_json(custom_strings_value, "custom genre strings")
+            if isinstance(parsed_custom, list) and parsed_custom:
+                # Wrap it in a CommentedSeq to enforce flow style
+                custom_flow_list = CommentedSeq(parsed_custom)
+                custom_flow_list.fa.set_flow_style()  # Force [ "Thriller", "Action" ] formatting
+                operations.mass_genre_update.append(custom_flow_list)
+
+        # Content rating and original title accept any source plus a custom string,
+        # used when the grouped parsing below finds nothing
+        content_rating = []
+        rating_order_value = attributes.get("mass_content_rating_update_order")
+        if rating_order_value:
+            parsed = decode_json(rating_order_value, "content rating sources")
+            if isinstance(parsed, list):
+                content_rating.extend(parsed)
+        rating_custom_string = attributes.get("mass_content_rating_update_custom_string")
+        if rating_custom_string and rating_custom_string.strip():
+            content_rating.append(rating_custom_string.strip())
+
+        original_title = []
+        title_order_value = attributes.get("mass_original_title_update_order")
+        if title_order_value:
+            parsed = decode_json(title_order_value, "original title order")
+            if isinstance(parsed, list):
+                for item in parsed:
+                    if isinstance(item, str):
+                        original_title.append(item)
+                    elif isinstance(item, list):  # nested list — flatten it
+                        original_title.extend(item)
+        title_custom_string = attributes.get("mass_original_title_update_custom_string")
+        if isinstance(title_custom_string, str) and title_custom_string.strip():
+            original_title.append(title_custom_string.strip())
+
+        operations.mass_content_rating_update = content_rating
+        operations.mass_original_title_update = original_title
+
+        for key in OPERATION_FLAGS:
+            value = attributes.get(key, None)
+            if is_set(value):
+                setattr(operations, key, value)
+
+        for key in DELETE_COLLECTIONS_FIELDS:
+            value = attributes.get(key, None)
+            if is_set(value):
+                operations.delete_collections[key.replace("delete_collections_", "")] = value
+
+        for op in GROUPED_OPERATIONS:
+            op_values = parse_grouped_operation(attributes, op)
+            if op_values:
+                setattr(operations, op, op_values)
+
+        for mapper_key in ("genre_mapper", "content_rating_mapper"):
+            mapping_value = attributes.get(mapper_key)
+            if mapping_value:
+                parsed_mapping = decode_json(mapping_value, mapper_key)
+                if isinstance(parsed_mapping, dict) and parsed_mapping:
+                    setattr(operations, mapper_key, parsed_mapping)
+
+        operations.metadata_backup = MetadataBackup.from_form(attributes)
+
+        for key in POSTER_FIELDS:
+            value = attributes.get(f"mass_poster_{key}")
+            if value not in [None, False, ""]:
+                operations.mass_poster_details[key] = value
+
+        for key in BACKGROUND_FIELDS:
+            value = attributes.get(f"mass_background_{key}")
+            if value not in [None, False, ""]:
+                operations.mass_background_details[key] = value
+
+        return operations
+
+    def to_kometa(self):
+        operations = {key: getattr(self, key) for key in OPERATION_FLAGS if is_set(getattr(self, key))}
+        if self.delete_collections:
+            operations["delete_collections"] = self.delete_collections
+        if self.mass_genre_update:
+            operations["mass_genre_update"] = self.mass_genre_update
+        for op in GROUPED_OPERATIONS:
+            values = getattr(self, op)
+            if values:
+                operations[op] = block_seq(values)
+        if self.genre_mapper:
+            operations["genre_mapper"] = self.genre_mapper
+        if self.content_rating_mapper:
+            operations["content_rating_mapper"] = self.content_rating_mapper
+        backup = self.metadata_backup.to_kometa()
+        if backup:
+            operations["metadata_backup"] = backup
+        # The detailed poster/background settings win over a plain source list
+        if self.mass_poster_details:
+            operations["mass_poster_update"] = self.mass_poster_details
+        if self.mass_background_details:
+            operations["mass_background_update"] = self.mass_background_details
+
+        ordered = {key: operations[key] for key in OPERATIONS_ORDER if key in operations}
+        ordered.update((key, value) for key, value in operations.items() if key not in ordered)
+        return ordered
+
+
+@dataclass(slots=True)
+class LibraryConfig:
+    """One library of the Kometa config, parsed once from the grouped form data of parse_library_keys."""
+
+    lib_id: str
+    title: str
+    library_type: str
+    collection_files: list = field(default_factory=list)
+    overlay_files: list = field(default_factory=list)
+    template_variables: TemplateVariables = field(default_factory=TemplateVariables)
+    operations: Operations = field(default_factory=Operations)
+    report_path: Any = None
+    remove_overlays: bool = False
+    reset_overlays: Any = None
+
+    @classmethod
+    def from_form(cls, lib_id, title, library_type, groups):
+        attributes = groups.get("attribute", {})
+        top_level = groups.get("top_level", {})
+
+        overlay_files = []
+        for name, value in groups.get("overlay", {}).items():
+            if isinstance(value, bool) and value:
+                overlay_files.append(name)
+            elif isinstance(value, str) and value:
+                overlay_files.append("commonsense" if value.lower() == "commonsense" else f"content_rating_{value}")
+
+        reset_overlays = top_level.get("reset_overlays")
+        return cls(
+            lib_id=lib_id,
+            title=title,
+            library_type=library_type,
+            collection_files=[name for name, selected in groups.get("collection", {}).items() if selected is True],
+            overlay_files=overlay_files,
+            template_variables=TemplateVariables.from_form(groups.get("template_variables", {}), attributes),
+            operations=Operations.from_form(attributes),
+            report_path=top_level.get("report_path"),
+            remove_overlays=bool(top_level.get("remove_overlays")),
+            reset_overlays=reset_overlays if reset_overlays not in [None, "None", ""] else None,
+        )
+
+    def to_kometa(self):
+        """Serialize to the Kometa library structure, keys ordered the way the Kometa Wiki shows them."""
+        entry = {}
+        if self.report_path not in [None, ""]:
+            entry["report_path"] = self.report_path
+        if self.remove_overlays:
+            entry["remove_overlays"] = True
+        if self.reset_overlays is not None:
+            entry["reset_overlays"] = self.reset_overlays
+        entry["template_variables"] = self.template_variables.to_kometa()
+        operations = self.operations.to_kometa()
+        if operations:
+            entry["operations"] = operations
+        if self.collection_files:
+            entry["collection_files"] = [{"default": name} for name in self.collection_files]
+        if self.overlay_files:
+            entry["overlay_files"] = [{"default": name} for name in self.overlay_files]
+        return entry
+
+
+def benchmark_library(lib_id, title, library_type, groups, rounds=1000):
+    """Return the average seconds to parse one library entry from its grouped form data and serialize it."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        LibraryConfig.from_form(lib_id, title, library_type, groups).to_kometa()
+    return (time.perf_counter() - start) / rounds
+
+
+def benchmark_stored_libraries(name, rounds=1000):
+    """Time every library stored for a config on its own, without Flask or the rest of build_config."""
+    from modules import database
+
+    data = database.retrieve_section_data(name, "libraries")[2] or {}
+    parsed = parse_library_keys(data.get("libraries", {}))
+    libraries = [
+        (lib_id, groups["library"]["title"], library_type, groups)
+        for library_type in ("mov", "sho")
+        for lib_id, groups in parsed.get(library_type, {}).items()
+        if "library" in groups
+    ]
+    if not libraries:
+        print(f"[INFO] No stored libraries to benchmark for config '{name}'.")
+        return
+
+    print(f"[INFO] {len(libraries)} libraries of config '{name}', averaged over {rounds} rounds")
+    for lib_id, title, library_type, groups in libraries:
+        seconds = benchmark_library(lib_id, title, library_type, groups, rounds)
+        print(f"[INFO] {library_type}-library_{lib_id:<30} {seconds * 1000000:>10.1f} µs per entry")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time building library entries of a stored config")
+    parser.add_argument("--benchmark", metavar="CONFIG_NAME", required=True, help="Config whose stored libraries are timed")
+    parser.add_argument("--rounds", type=int, default=1000, help="Rounds per library")
+    args = parser.parse_args()
+
+    benchmark_stored_libraries(args.benchmark, args.rounds)
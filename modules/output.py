@@ -1,15 +1,40 @@
 import io
 import os
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
-import jsonschema
 import pyfiglet
 from flask import current_app as app
 from ruamel.yaml import YAML
-from ruamel.yaml.comments import CommentedSeq
 
-from modules import helpers, persistence
+from modules import helpers, library_config, persistence, schema_sync, schema_validator, version_check
+
+# Number of rendered configs kept in memory, least recently used ones are evicted first
+CONFIG_CACHE_SIZE = int(os.getenv("QS_CONFIG_CACHE_SIZE", "32"))
+
+_config_cache_lock = threading.Lock()
+_config_cache = OrderedDict()  # render key -> RenderedConfig
+
+# Header art by (font, title); fonts are parsed once and the titles never change, so nothing is evicted
+_header_lock = threading.Lock()
+_figlets = {}  # font -> pyfiglet.Figlet, or None when pyfiglet cannot load it
+_header_cache = {}  # (font, title) -> header art
+
+
+class RenderedConfig:
+    """The output of build_config for one combination of section revisions and header style."""
+
+    __slots__ = ("key", "validated", "validation_error", "config_data", "yaml_content", "redacted_content")
+
+    def __init__(self, key, validated, validation_error, config_data, yaml_content, redacted_content):
+        self.key = key
+        self.validated = validated
+        self.validation_error = validation_error
+        self.config_data = config_data
+        self.yaml_content = yaml_content
+        self.redacted_content = redacted_content
 
 
 def add_border_to_ascii_art(art):
@@ -21,16 +46,53 @@ def add_border_to_ascii_art(art):
     return "\n".join(bordered_art)
 
 
+def divider_heading(title):
+    return f"#==================== {title} ====================#"
+
+
+def get_figlet(font):
+    """Return the preloaded Figlet for this font, or None when pyfiglet cannot load it."""
+    with _header_lock:
+        if font not in _figlets:
+            try:
+                _figlets[font] = pyfiglet.Figlet(font=font)
+            except pyfiglet.FontNotFound:
+                _figlets[font] = None
+        return _figlets[font]
+
+
 def section_heading(title, font="standard"):
     if font == "none":
         return ""
     elif font == "single line":
-        return f"#==================== {title} ====================#"
-    else:
-        try:
-            return add_border_to_ascii_art(pyfiglet.figlet_format(title, font=font))
-        except pyfiglet.FontNotFound:
-            return f"#==================== {title} ====================#"
+        return divider_heading(title)
+
+    key = (font, title)
+    heading = _header_cache.get(key)
+    if heading is None:
+        figlet = get_figlet(font)
+        heading = add_border_to_ascii_art(figlet.renderText(title)) if figlet else divider_heading(title)
+        _header_cache[key] = heading
+    return heading
+
+
+def warm_section_headings(flask_app):
+    """Render every section title in every bundled font so the final page never waits on pyfiglet."""
+    try:
+        with flask_app.app_context():
+            titles = [item["name"] for item in helpers.get_template_list().values()] + ["KOMETA"]
+            for font in helpers.get_pyfiglet_fonts():
+                for title in titles:
+                    section_heading(title, font)
+        if flask_app.config["QS_DEBUG"]:
+            print(f"[DEBUG] Warmed {len(_header_cache)} section headings")
+    except Exception as e:
+        print(f"[WARNING] Warming section headings failed: {e}")
+
+
+def start_header_warmup(flask_app):
+    """Warm the section headings cache once, without blocking startup."""
+    threading.Thread(target=warm_section_headings, args=(flask_app,), name="header-warmup", daemon=True).start()
 
 
 def clean_section_data(section_data, config_attribute):
@@ -53,475 +115,25 @@ def clean_section_data(section_data, config_attribute):
     return clean_data
 
 
-def build_libraries_section(
-    movie_libraries,
-    show_libraries,
-    movie_collections,
-    show_collections,
-    movie_overlays,
-    show_overlays,
-    movie_attributes,
-    show_attributes,
-    movie_templates,
-    show_templates,
-    movie_top_level,
-    show_top_level,
-):
+def build_libraries_section(parsed_libraries):
+    """
+    Build the libraries section from the output of library_config.parse_library_keys.
+    Only libraries whose `-library` checkbox was stored are included.
+    """
     libraries_section = {}
 
-    def add_entry(
-        library_key,
-        library_name,
-        library_type,
-        collections,
-        overlays,
-        attributes,
-        templates,
-        top_level,
-    ):
-        """Processes a single library and adds valid data to the output."""
-        entry = {}
-
-        lib_id = helpers.extract_library_name(library_key)
-
-        if app.config["QS_DEBUG"]:
-            print(f"[DEBUG] Processing Library: {library_key} -> {library_name}")
-
-        # Process Operations Attributes
-        operations_fields = [
-            "assets_for_all",
-            "mass_imdb_parental_labels",
-            "mass_collection_mode",
-            "update_blank_track_titles",
-            "remove_title_parentheses",
-            "split_duplicates",
-            "radarr_add_all",
-            "sonarr_add_all",
-        ]
-        operations = {}
-        attr_group = attributes.get(lib_id, {})
-        # Begin: Mass Genre Update Section
-        mass_genre_update_keys = [
-            "tmdb",
-            "tvdb",
-            "imdb",
-            "omdb",
-            "anidb",
-            "anidb_3_0",
-            "anidb_2_5",
-            "anidb_2_0",
-            "anidb_1_5",
-            "anidb_1_0",
-            "anidb_0_5",
-            "mal",
-            "lock",
-            "unlock",
-            "remove",
-            "reset",
-        ]
-        mass_genre_update = []
-
-        # Grab the full reordered list from hidden input
-        custom_key = f"{library_type}-library_{lib_id}-attribute_mass_genre_update_order"
-        order_value = attr_group.get(custom_key)
-
-        if order_value:
-            try:
-                parsed = json.loads(order_value)
-                if isinstance(parsed, list):
-                    for item in parsed:
-                        if isinstance(item, str) and item.startswith("[") and item.endswith("]"):
-                            # Probably malformed nested list — skip
-                            continue
-                        elif isinstance(item, str):
-                            mass_genre_update.append(item)
-                        elif isinstance(item, list):  # rare case
-                            mass_genre_update.extend(item)
-            except Exception as e:
-                print(f"[DEBUG] Skipping invalid JSON in custom genre: {order_value} — {e}")
-
-        # Also include custom genre strings (if any) from the other hidden input
-        custom_strings_key = f"{library_type}-library_{lib_id}-attribute_mass_genre_update_custom"
-        custom_strings_value = attr_group.get(custom_strings_key)
-
-        if custom_strings_value:
-            try:
-                parsed_custom = json.loads(custom_strings_value)
-                if isinstance(parsed_custom, list) and parsed_custom:
-                    # Wrap it in a CommentedSeq to enforce flow style
-                    custom_flow_list = CommentedSeq(parsed_custom)
-                    custom_flow_list.fa.set_flow_style()  # Force [ "Thriller", "Action" ] formatting
-                    mass_genre_update.append(custom_flow_list)
-            except Exception as e:
-                print(f"[DEBUG] Skipping invalid JSON in custom genre strings: {custom_strings_value} — {e}")
-
-        if mass_genre_update:
-            operations["mass_genre_update"] = mass_genre_update
-
-        # Begin: Mass Content Rating Update Section
-        mass_content_rating_update = []
-
-        # Get the ordered source list (sortable)
-        rating_custom_order_key = f"{library_type}-library_{lib_id}-attribute_mass_content_rating_update_order"
-        rating_custom_order_value = attr_group.get(rating_custom_order_key)
-
-        if rating_custom_order_value:
-            try:
-                parsed = json.loads(rating_custom_order_value)
-                if isinstance(parsed, list):
-                    mass_content_rating_update.extend(parsed)
-            except Exception as e:
-                print(f"[DEBUG] Skipping invalid JSON in content rating sources: {rating_custom_order_value} — {e}")
-
-        # Get the optional custom string (e.g., "NR")
-        rating_custom_string_key = f"{library_type}-library_{lib_id}-attribute_mass_content_rating_update_custom_string"
-        rating_custom_string_value = None
-        if attr_group and rating_custom_string_key in attr_group:
-            raw_value = attr_group.get(rating_custom_string_key)
-            if raw_value:
-                rating_custom_string_value = raw_value.strip()
-
-        if rating_custom_string_value:
-            mass_content_rating_update.append(rating_custom_string_value)
-
-        # Only add to operations if we have any items
-        if mass_content_rating_update:
-            mcru_list = CommentedSeq(mass_content_rating_update)
-            mcru_list.fa.set_block_style()  # ensures YAML list style
-            operations["mass_content_rating_update"] = mcru_list
-
-        # Begin: Mass Original Title Update Section
-        mass_original_title_update = []
-
-        # Handle the toggle order list
-        original_title_order_key = f"{library_type}-library_{lib_id}-attribute_mass_original_title_update_order"
-        original_title_order_value = attr_group.get(original_title_order_key)
-
-        if original_title_order_value:
-            try:
-                parsed = json.loads(original_title_order_value)
-                if isinstance(parsed, list):
-                    for item in parsed:
-                        if isinstance(item, str):
-                            mass_original_title_update.append(item)
-                        elif isinstance(item, list):  # nested list — flatten it
-                            mass_original_title_update.extend(item)
-            except Exception as e:
-                print(f"[DEBUG] Skipping invalid JSON in original title order: {original_title_order_value} — {e}")
-
-        # Handle the optional custom string (e.g., "Unknown")
-        original_title_custom_key = f"{library_type}-library_{lib_id}-attribute_mass_original_title_update_custom_string"
-        original_title_custom_value = attr_group.get(original_title_custom_key)
-
-        if original_title_custom_value:
-            try:
-                stripped = original_title_custom_value.strip()
-                if stripped:
-                    mass_original_title_update.append(stripped)
-            except Exception as e:
-                print(f"[DEBUG] Skipping invalid original title custom string: {original_title_custom_value} — {e}")
-
-        if mass_original_title_update:
-            motu_list = CommentedSeq(mass_original_title_update)
-            motu_list.fa.set_block_style()
-            operations["mass_original_title_update"] = motu_list
-
-        for field in operations_fields:
-            attr_key = f"{library_type}-library_{lib_id}-attribute_{field}"
-            value = attr_group.get(attr_key, None)
-            if value not in [None, "", False]:
-                operations[field] = value
-
-        # Handle nested delete_collections block
-        delete_fields = [
-            "delete_collections_configured",
-            "delete_collections_managed",
-            "delete_collections_less",
-            "delete_collections_ignore_empty_smart_collections",
-        ]
-        delete_collections = {}
-        for df in delete_fields:
-            attr_key = f"{library_type}-library_{lib_id}-attribute_{df}"
-            value = attr_group.get(attr_key, None)
-            if value not in [None, "", False]:
-                yaml_key = df.replace("delete_collections_", "")
-                delete_collections[yaml_key] = value
-
-        if delete_collections:
-            operations["delete_collections"] = delete_collections
-
-        if operations:
-            entry["operations"] = operations
-
-        # Process Collections
-        collection_key = helpers.extract_library_name(library_key)
-        if collection_key and collection_key in collections:
-            collection_files = [
-                {"default": key.split(f"{library_type}-library_{collection_key}-collection_")[-1]} for key, selected in collections[collection_key].items() if selected is True
-            ]
-            if collection_files:
-                entry["collection_files"] = collection_files
-
-        # Process Overlays
-        overlay_key = helpers.extract_library_name(library_key)
-        if overlay_key and overlay_key in overlays:
-            overlay_files = []
-            for key, value in overlays[overlay_key].items():
-                if isinstance(value, bool) and value:
-                    overlay_files.append({"default": key.split(f"{library_type}-library_{overlay_key}-overlay_")[-1]})
-                elif isinstance(value, str) and value:
-                    if value.lower() == "commonsense":
-                        overlay_files.append({"default": "commonsense"})
-                    else:
-                        overlay_files.append({"default": f"content_rating_{value}"})
-            if overlay_files:
-                entry["overlay_files"] = overlay_files
-
-        # Template Variables
-        template_key = helpers.extract_library_name(library_key)
-        template_data = templates.get(template_key, {})
-
-        sep_color_key = None
-        placeholder_key = None
-        language_key = None
-
-        for key in template_data.keys():
-            if key.endswith("-template_variables[use_separator]") and key.startswith(f"{library_type}-library_{template_key}"):
-                sep_color_key = key
-            if key.endswith("-attribute_template_variables[placeholder_imdb_id]") and key.startswith(f"{library_type}-library_{template_key}"):
-                placeholder_key = key
-            if key.endswith("-template_variables[language]") and key.startswith(f"{library_type}-library_{template_key}"):
-                language_key = key
-
-        sep_color = template_data.get(sep_color_key)
-        placeholder_id = template_data.get(placeholder_key)
-        language_value = template_data.get(language_key)
-
-        template_vars = {"use_separator": True if sep_color else False}
-
-        if sep_color:
-            template_vars["sep_style"] = sep_color
-
-        if placeholder_id:
-            template_vars["placeholder_imdb_id"] = placeholder_id
-
-        if language_value:
-            template_vars["language"] = language_value
-
-        entry["template_variables"] = template_vars
-
-        # Grouped mass update operations (excluding mass_genre_update, handled earlier)
-        grouped_operations = [
-            "mass_content_rating_update",
-            "mass_original_title_update",
-            "mass_studio_update",
-            "mass_tagline_update",
-            "mass_originally_available_update",
-            "mass_added_at_update",
-            "mass_audience_rating_update",
-            "mass_critic_rating_update",
-            "mass_user_rating_update",
-            "mass_episode_audience_rating_update",
-            "mass_episode_critic_rating_update",
-            "mass_episode_user_rating_update",
-            "mass_background_update",
-            "mass_poster_update",
-            "radarr_remove_by_tag",
-            "sonarr_remove_by_tag",
-        ]
-
-        for op in grouped_operations:
-            custom_list_key = f"{library_type}-library_{lib_id}-attribute_{op}_custom"
-            custom_string_key = f"{library_type}-library_{lib_id}-attribute_{op}_custom_string"
-            order_key = f"{library_type}-library_{lib_id}-attribute_{op}_order"
-
-            op_values = []
-
-            # 1. Ordered source list (sortable)
-            order_value = attr_group.get(order_key)
-            if order_value:
-                try:
-                    parsed = json.loads(order_value)
-                    if isinstance(parsed, list):
-                        for item in parsed:
-                            if isinstance(item, (int, float)):
-                                op_values.append(item)
-                            elif isinstance(item, str) and item.strip():
-                                # Preserve valid date strings (e.g. "2023-01-01")
-                                op_values.append(item.strip())
-                except Exception as e:
-                    print(f"[DEBUG] Skipping invalid JSON in {op}_order: {order_value} — {e}")
-
-            # 2. Custom list (JSON array from UI)
-            custom_list_value = attr_group.get(custom_list_key)
-            if custom_list_value:
-                try:
-                    parsed_custom = json.loads(custom_list_value)
-                    if isinstance(parsed_custom, list):
-                        for item in parsed_custom:
-                            if isinstance(item, (int, float)):
-                                op_values.append(item)
-                            elif isinstance(item, str) and item.strip():
-                                op_values.append(item.strip())
-                except Exception as e:
-                    print(f"[DEBUG] Skipping invalid JSON in {op}_custom: {custom_list_value} — {e}")
-
-            # 3. Fallback to single custom string (if defined)
-            elif custom_string_key in attr_group:
-                raw_value = attr_group.get(custom_string_key)
-                if isinstance(raw_value, str) and raw_value.strip():
-                    if op in [
-                        "mass_critic_rating_update",
-                        "mass_user_rating_update",
-                        "mass_audience_rating_update",
-                        "mass_episode_critic_rating_update",
-                        "mass_episode_user_rating_update",
-                        "mass_episode_audience_rating_update",
-                    ]:
-                        try:
-                            op_values.append(float(raw_value.strip()))
-                        except ValueError:
-                            pass  # Invalid float, skip
-                    else:
-                        op_values.append(raw_value.strip())
-                elif isinstance(raw_value, (int, float)):
-                    op_values.append(raw_value)
-
-            # 4. Output formatting
-            if op_values:
-                seq = CommentedSeq(op_values)
-                seq.fa.set_block_style()
-                for i in range(len(seq)):
-                    if isinstance(seq[i], float) and seq[i].is_integer():
-                        seq[i] = float(f"{seq[i]:.1f}")
-                operations[op] = seq
-
-        # genre_mapper and content_rating_mapper
-        for mapper_key in ["genre_mapper", "content_rating_mapper"]:
-            full_key = f"{library_type}-library_{lib_id}-attribute_{mapper_key}"
-            mapping_value = attr_group.get(full_key)
-            if mapping_value:
-                try:
-                    parsed_mapping = json.loads(mapping_value)
-                    if isinstance(parsed_mapping, dict) and parsed_mapping:
-                        operations[mapper_key] = parsed_mapping
-                except Exception as e:
-                    print(f"[DEBUG] Skipping invalid JSON for {mapper_key}: {mapping_value} — {e}")
-
-        # metadata_backup
-        backup = {}
-        path_key = f"{library_type}-library_{lib_id}-attribute_metadata_backup_path"
-        exclude_key = f"{library_type}-library_{lib_id}-attribute_metadata_backup_exclude"
-        sync_key = f"{library_type}-library_{lib_id}-attribute_sync_tags"
-        blank_key = f"{library_type}-library_{lib_id}-attribute_add_blank_entries"
-
-        if attr_group.get(path_key):
-            backup["path"] = attr_group.get(path_key)
-
-        # Only add exclude if it is a non-empty list
-        if attr_group.get(exclude_key):
-            val = attr_group.get(exclude_key)
-            try:
-                parsed = json.loads(val) if isinstance(val, str) else val
-                if isinstance(parsed, list) and parsed:  # non-empty list only
-                    backup["exclude"] = parsed
-            except Exception as e:
-                print(f"[DEBUG] Skipping invalid exclude value: {val} — {e}")
-
-        if attr_group.get(sync_key) is True:
-            backup["sync_tags"] = True
-        if attr_group.get(blank_key) is True:
-            backup["add_blank_entries"] = True
-
-        # Only add to operations if backup has any keys
-        if backup:
-            operations["metadata_backup"] = backup
-
-        # mass_poster_update
-        poster = {}
-        for key in [
-            "seasons",
-            "episodes",
-            "ignore_locked",
-            "ignore_overlays",
-            "source",
-        ]:
-            full_key = f"{library_type}-library_{lib_id}-attribute_mass_poster_{key}"
-            val = attr_group.get(full_key)
-            if val not in [None, False, ""]:
-                poster[key] = val
-        if poster:
-            operations["mass_poster_update"] = poster
-
-        # mass_background_update
-        background = {}
-        for key in ["seasons", "episodes", "ignore_locked", "source"]:
-            full_key = f"{library_type}-library_{lib_id}-attribute_mass_background_{key}"
-            val = attr_group.get(full_key)
-            if val not in [None, False, ""]:
-                background[key] = val
-        if background:
-            operations["mass_background_update"] = background
-
-        # Remove/Reset Overlays
-        top_group = top_level.get(lib_id, {})
-
-        remove_key = f"{library_type}-library_{lib_id}-top_level_remove_overlays"
-        reset_key = f"{library_type}-library_{lib_id}-top_level_reset_overlays"
-        report_path_key = f"{library_type}-library_{lib_id}-top_level_report_path"
-
-        remove_overlays = top_group.get(remove_key)
-        reset_overlays = top_group.get(reset_key)
-        report_path = top_group.get(report_path_key)
-
-        if report_path not in [None, ""]:
-            entry["report_path"] = report_path
-        if remove_overlays:
-            entry["remove_overlays"] = True
-        if reset_overlays not in [None, "None", ""]:
-            entry["reset_overlays"] = reset_overlays
-
-        if app.config["QS_DEBUG"]:
-            print(f"[DEBUG] Top Level for {lib_id}: {top_group}")
-            print(f"[DEBUG] {report_path_key} = {report_path}")
-            print(f"[DEBUG] {remove_key} = {remove_overlays}")
-            print(f"[DEBUG] {reset_key} = {reset_overlays}")
-
-        if operations:
-            entry["operations"] = operations
+    # Process movie libraries, then show libraries
+    for library_type in ("mov", "sho"):
+        for lib_id, groups in parsed_libraries.get(library_type, {}).items():
+            if "library" not in groups:
+                continue
 
-        if app.config["QS_DEBUG"]:
-            print(f"[DEBUG] Entry for {library_name}: {entry}")
-
-        libraries_section[library_name] = reorder_library_section(entry)
-
-    #############################################################################################
-
-    # Process movie libraries
-    for lk, ln in movie_libraries.items():
-        add_entry(
-            lk,
-            ln,
-            "mov",
-            movie_collections,
-            movie_overlays,
-            movie_attributes,
-            movie_templates,
-            movie_top_level,
-        )
+            library = library_config.LibraryConfig.from_form(lib_id, groups["library"]["title"], library_type, groups)
+            if app.config["QS_DEBUG"]:
+                print(f"[DEBUG] Processing Library: {library_type}-library_{lib_id} -> {library.title}")
+                print(f"[DEBUG] Parsed library: {library}")
 
-    # Process show libraries
-    for lk, ln in show_libraries.items():
-        add_entry(
-            lk,
-            ln,
-            "sho",
-            show_collections,
-            show_overlays,
-            show_attributes,
-            show_templates,
-            show_top_level,
-        )
+            libraries_section[library.title] = library.to_kometa()
 
     if app.config["QS_DEBUG"]:
         print("[DEBUG] Generated YAML Output:\n")
@@ -532,121 +144,39 @@ def build_libraries_section(
     return {"libraries": libraries_section}
 
 
-def reorder_library_section(library_data):
+# Config sections in the order they are written to the final config, with the template they come from
+OUTPUT_SECTIONS = [
+    ("libraries", "025-libraries"),
+    ("playlist_files", "027-playlist_files"),
+    ("settings", "150-settings"),
+    ("webhooks", "140-webhooks"),
+    ("plex", "010-plex"),
+    ("tmdb", "020-tmdb"),
+    ("tautulli", "030-tautulli"),
+    ("github", "040-github"),
+    ("omdb", "050-omdb"),
+    ("mdblist", "060-mdblist"),
+    ("notifiarr", "070-notifiarr"),
+    ("gotify", "080-gotify"),
+    ("ntfy", "085-ntfy"),
+    ("anidb", "090-anidb"),
+    ("radarr", "100-radarr"),
+    ("sonarr", "110-sonarr"),
+    ("trakt", "120-trakt"),
+    ("mal", "130-mal"),
+]
+
+
+def build_section(config_attribute, section_data):
     """
-    Reorders library data so that:
-    - `report_path` appears first.
-    - `remove_overlays` and `reset_overlays` come next.
-    - `template_variables` next.
-    - Keys inside `operations` are ordered as per Kometa Wiki.
-    - Other keys retain their natural order.
+    Turn one validated section, as returned by persistence.retrieve_settings, into its config_data entry.
+    Returns None when nothing of the section ends up in the config.
     """
-    reordered_data = {}
-
-    # 1. Place report_path first if it exists
-    if "report_path" in library_data:
-        reordered_data["report_path"] = library_data["report_path"]
-
-    # 2. Then remove/reset overlays
-    if "remove_overlays" in library_data:
-        reordered_data["remove_overlays"] = library_data["remove_overlays"]
-    if "reset_overlays" in library_data:
-        reordered_data["reset_overlays"] = library_data["reset_overlays"]
-
-    # 3. Then template_variables
-    if "template_variables" in library_data:
-        reordered_data["template_variables"] = library_data["template_variables"]
-
-    # 4. Reorder operations
-    operations_order = [
-        "assets_for_all",
-        "delete_collections",
-        "mass_genre_update",
-        "mass_content_rating_update",
-        "mass_original_title_update",
-        "mass_studio_update",
-        "mass_originally_available_update",
-        "mass_added_at_update",
-        "mass_audience_rating_update",
-        "mass_critic_rating_update",
-        "mass_user_rating_update",
-        "mass_episode_audience_rating_update",
-        "mass_episode_critic_rating_update",
-        "mass_episode_user_rating_update",
-        "mass_poster_update",
-        "mass_background_update",
-        "mass_imdb_parental_labels",
-        "mass_collection_mode",
-        "update_blank_track_titles",
-        "remove_title_parentheses",
-        "split_duplicates",
-        "radarr_add_all",
-        "radarr_remove_by_tag",
-        "sonarr_add_all",
-        "sonarr_remove_by_tag",
-        "genre_mapper",
-        "content_rating_mapper",
-        "metadata_backup",
-    ]
-
-    if "operations" in library_data:
-        ordered_ops = {}
-        ops = library_data["operations"]
-        for key in operations_order:
-            if key in ops:
-                ordered_ops[key] = ops[key]
-        # Include any unknown keys at the end
-        for k, v in ops.items():
-            if k not in ordered_ops:
-                ordered_ops[k] = v
-        reordered_data["operations"] = ordered_ops
-
-    # 5. Finally add any other keys that weren't handled
-    for key, value in library_data.items():
-        if key not in reordered_data:
-            reordered_data[key] = value
-
-    return reordered_data
-
-
-def build_config(header_style="standard", config_name=None):
-    """
-    Build the final configuration, including all sections and headers,
-    ensuring the libraries section is properly processed.
-    """
-    sections = helpers.get_template_list()
-    config_data = {}
-    header_art = {}
-
-    # Process sections and generate header art
-    for name in sections:
-        item = sections[name]
-        persistence_key = item["stem"]
-        config_attribute = item["raw_name"]
-
-        # Handle all header styles
-        if header_style == "none":
-            header_art[config_attribute] = ""  # No headers at all
-        elif header_style == "single line":  # Standardizes "single line" as divider format
-            header_art[config_attribute] = "#==================== " + item["name"] + " ====================#"
-        else:
-            # Handle custom PyFiglet fonts dynamically (including "standard")
-            try:
-                figlet_text = pyfiglet.figlet_format(item["name"], font=header_style)
-                header_art[config_attribute] = add_border_to_ascii_art(figlet_text)
-            except pyfiglet.FontNotFound:
-                # Fallback to "single line" divider format instead of basic text
-                header_art[config_attribute] = "#==================== " + item["name"] + " ====================#"
-
-        # Retrieve settings for each section
-        section_data = persistence.retrieve_settings(persistence_key)
-
-        if "validated" in section_data and section_data["validated"]:
-            config_data[config_attribute] = clean_section_data(section_data, config_attribute)
+    section = clean_section_data(section_data, config_attribute)
 
     # Process playlist_files section
-    if "playlist_files" in config_data:
-        playlist_data = config_data["playlist_files"]
+    if config_attribute == "playlist_files":
+        playlist_data = section
 
         # Debug raw data
         if app.config["QS_DEBUG"]:
@@ -668,7 +198,7 @@ def build_config(header_style="standard", config_name=None):
             print(f"[DEBUG] Processed libraries list: {libraries_value}")
 
         # Format playlist_files data
-        formatted_playlist_files = {
+        section = {
             "playlist_files": [
                 {
                     "default": "playlist",
@@ -677,13 +207,10 @@ def build_config(header_style="standard", config_name=None):
             ]
         }
         if app.config["QS_DEBUG"]:
-            print("[DEBUG] Formatted playlist_files data:", formatted_playlist_files)
-
-        # Replace in config_data
-        config_data["playlist_files"] = formatted_playlist_files
+            print("[DEBUG] Formatted playlist_files data:", section)
 
-    if "webhooks" in config_data:
-        webhooks_data = config_data["webhooks"]
+    elif config_attribute == "webhooks":
+        webhooks_data = section
 
         # Handle case where `webhooks` is nested inside itself
         if isinstance(webhooks_data, dict) and "webhooks" in webhooks_data:
@@ -692,97 +219,73 @@ def build_config(header_style="standard", config_name=None):
         # Remove empty values
         cleaned_webhooks = {key: value for key, value in webhooks_data.items() if value is not None and value != "" and value != [] and value != {}}
 
-        # If no valid webhooks exist, remove the "webhooks" section entirely
-        if cleaned_webhooks:
-            config_data["webhooks"] = {"webhooks": cleaned_webhooks}  # Preserve webhooks key
-        else:
-            config_data.pop("webhooks", None)  # Fully remove empty webhooks
-
         # Debugging: Ensure webhooks are correctly cleaned
         if app.config["QS_DEBUG"]:
             print(f"[DEBUG] Cleaned Webhooks Data AFTER Removing Empty Values: {cleaned_webhooks}")
-            if "webhooks" not in config_data:
+            if not cleaned_webhooks:
                 print("[DEBUG] Webhooks section completely removed.")
 
+        # If no valid webhooks exist, remove the "webhooks" section entirely
+        if not cleaned_webhooks:
+            return None
+        section = {"webhooks": cleaned_webhooks}  # Preserve webhooks key
+
     # Process the libraries section
-    if "libraries" in config_data and "libraries" in config_data["libraries"]:
-        nested_libraries_data = config_data["libraries"]["libraries"]
+    elif config_attribute == "libraries" and "libraries" in section:
+        nested_libraries_data = section["libraries"]
 
         # Debugging
         if app.config["QS_DEBUG"]:
             print("[DEBUG] Raw nested libraries data:", nested_libraries_data)
 
-        # Extract selected libraries
-        movie_libraries = {key: value for key, value in nested_libraries_data.items() if key.startswith("mov-library_") and key.endswith("-library")}
-        show_libraries = {key: value for key, value in nested_libraries_data.items() if key.startswith("sho-library_") and key.endswith("-library")}
-
-        # Extract **correct** movie and show library names
-        movie_library_names = {helpers.extract_library_name(k) for k in movie_libraries}
-        show_library_names = {helpers.extract_library_name(k) for k in show_libraries}
+        # Split the flat form keys into {media type: {library: {kind: {field: value}}}} in one pass
+        parsed_libraries = library_config.parse_library_keys(nested_libraries_data)
 
         # Debugging
         if app.config["QS_DEBUG"]:
-            print("[DEBUG] Movie Library Names:", movie_library_names)
-            print("[DEBUG] Show Library Names:", show_library_names)
-
-        def group_by_library(prefix, names):
-            """
-            Groups collection, overlay, and attribute data by library.
-            """
-            grouped = {}
-            for key, value in [(k, v) for k, v in nested_libraries_data.items() if prefix in k and helpers.extract_library_name(k) in names]:
-                library_name = helpers.extract_library_name(key)
-                if library_name:
-                    if library_name not in grouped:
-                        grouped[library_name] = {}
-                    grouped[library_name][key] = value
-            return grouped
-
-        # Group collections, overlays, attributes, and templates only for selected libraries
-        movie_collections = group_by_library("collection_", movie_library_names)
-        show_collections = group_by_library("collection_", show_library_names)
-        movie_overlays = group_by_library("overlay_", movie_library_names)
-        show_overlays = group_by_library("overlay_", show_library_names)
-        movie_attributes = group_by_library("attribute_", movie_library_names)
-        show_attributes = group_by_library("attribute_", show_library_names)
-        movie_templates = group_by_library("template_variables", movie_library_names)
-        show_templates = group_by_library("template_variables", show_library_names)
-        movie_top_level = group_by_library("top_level_", movie_library_names)
-        show_top_level = group_by_library("top_level_", show_library_names)
-
-        # Debugging
-        if app.config["QS_DEBUG"]:
-            print(f"[DEBUG] Extracted Movie Libraries: {movie_libraries}")
-            print(f"[DEBUG] Extracted Show Libraries: {show_libraries}")
-            print(f"[DEBUG] Extracted Movie Collections: {movie_collections}")
-            print(f"[DEBUG] Extracted Show Collections: {show_collections}")
-            print(f"[DEBUG] Extracted Movie Overlays: {movie_overlays}")
-            print(f"[DEBUG] Extracted Show Overlays: {show_overlays}")
-            print(f"[DEBUG] Extracted Movie Attributes: {movie_attributes}")
-            print(f"[DEBUG] Extracted Show Attributes: {show_attributes}")
-            print(f"[DEBUG] Extracted Movie Templates: {movie_templates}")
-            print(f"[DEBUG] Extracted Show Templates: {show_templates}")
-            print(f"[DEBUG] Extracted Movie Top Level: {movie_top_level}")
-            print(f"[DEBUG] Extracted Show Top Level: {show_top_level}")
+            for library_type, libraries in parsed_libraries.items():
+                for lib_id, groups in libraries.items():
+                    print(f"[DEBUG] Parsed {library_type} library {lib_id}: {groups}")
 
         # Build nested libraries structure
-        libraries_section = build_libraries_section(
-            movie_libraries,
-            show_libraries,
-            movie_collections,
-            show_collections,
-            movie_overlays,
-            show_overlays,
-            movie_attributes,
-            show_attributes,
-            movie_templates,
-            show_templates,
-            movie_top_level,
-            show_top_level,
-        )
-        config_data["libraries"] = libraries_section
+        section = build_libraries_section(parsed_libraries)
         if app.config["QS_DEBUG"]:
-            print(f"[DEBUG] Final Libraries Section: {libraries_section}")
+            print(f"[DEBUG] Final Libraries Section: {section}")
+
+    # Ensure `code_verifier` is removed from mal.authorization (wherever it exists)
+    elif config_attribute == "mal" and "mal" in section:
+        authorization_data = section["mal"].get("authorization", {})
+        authorization_data.pop("code_verifier", None)  # Remove safely
+
+    # Apply enforce_string_fields to ensure proper formatting
+    return helpers.enforce_string_fields(section, helpers.STRING_FIELDS)
+
+
+def build_config(header_style="standard", config_name=None):
+    """
+    Build the final configuration, including all sections and headers,
+    ensuring the libraries section is properly processed.
+    The config is validated in memory, section by section, against the compiled json-schema.
+    """
+    sections = helpers.get_template_list()
+    config_data = {}
+    header_art = {}
+
+    # Process sections and generate header art
+    for name in sections:
+        item = sections[name]
+        persistence_key = item["stem"]
+        config_attribute = item["raw_name"]
+
+        header_art[config_attribute] = section_heading(item["name"], header_style)
+
+        # Retrieve settings for each section
+        section_data = persistence.retrieve_settings(persistence_key)
+
+        if "validated" in section_data and section_data["validated"]:
+            section = build_section(config_attribute, section_data)
+            if section is not None:
+                config_data[config_attribute] = section
 
     # Header comment for YAML file
     header_comment = (
@@ -790,33 +293,101 @@ def build_config(header_style="standard", config_name=None):
         "and YAML by Red Hat extension. VSC will also leverage the above link to enhance Kometa yml edits."
     )
 
-    # Build YAML content
-    yaml = YAML(typ="safe", pure=True)
-    yaml.default_flow_style = False
-    yaml.sort_keys = False
-
-    helpers.ensure_json_schema()
-
-    with open(os.path.join(helpers.JSON_SCHEMA_DIR, "config-schema.json"), "r") as file:
-        schema = yaml.load(file)
-
     # Fetch kometa_branch dynamically
-    version_info = helpers.check_for_update()
+    version_info = version_check.get_version_info()
     kometa_branch = version_info.get("kometa_branch", "nightly")  # Default to nightly if not found
 
     # Get the current timestamp in a readable format
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    yaml_content = (
+    header_content = (
         f"# yaml-language-server: $schema=https://raw.githubusercontent.com/Kometa-Team/Kometa/{kometa_branch}/json-schema/config-schema.json\n\n"
         f"{add_border_to_ascii_art(section_heading('KOMETA', font=header_style)) if header_style not in ['none', 'single line'] else section_heading('KOMETA', font=header_style)}\n\n"
         f"# {config_name} config created by Quickstart on {timestamp}\n\n"
         f"{header_comment}\n\n"
     )
 
-    # Function to dump YAML sections
-    def dump_section(title, dump_name, data):
+    # Render the plain and the redacted config in the same pass; the document is validated exactly as it is dumped
+    sensitive_keys = schema_validator.get_sensitive_keys()
+    document = {}
+    yaml_content = redacted_content = header_content
+    for section_key, section_stem in OUTPUT_SECTIONS:
+        if section_key in config_data:
+            fragment = clean_fragment(section_key, config_data[section_key])
+            document.update(fragment)
+            plain = section_fragment(header_art[section_key], section_key, fragment)
+            yaml_content += plain
+
+            # Sections without sensitive values come back as the same object and are not dumped twice
+            redacted = helpers.redact_sensitive_data(fragment, sensitive_keys)
+            redacted_content += plain if redacted is fragment else section_fragment(header_art[section_key], section_key, redacted)
+
+    validation_error = schema_validator.validate_config(document)
+    validated = validation_error is None
 
+    return validated, validation_error, config_data, yaml_content, redacted_content
+
+
+def validate_saved_section(target, config_name):
+    """
+    Validate a section against the json-schema right after its step was saved, so errors show up on the way
+    instead of on the final page; the result is cached and reused when the final config is validated.
+    Returns the error message, or None.
+    """
+    source, config_attribute = persistence.extract_names(target)
+    if config_attribute not in dict(OUTPUT_SECTIONS):
+        return None
+
+    section_data = persistence.retrieve_settings(source)
+    if not section_data.get("validated"):
+        return None
+
+    section = build_section(config_attribute, section_data)
+    error = None
+    if section is not None:
+        error = schema_validator.validate_section(config_attribute, clean_fragment(config_attribute, section))
+
+    progress = persistence.retrieve_section_progress(config_name).get(config_attribute, {})
+    schema_validator.record_saved_section(config_name, config_attribute, progress.get("content_hash"), error)
+
+    if error is not None and app.config["QS_DEBUG"]:
+        print(f"[DEBUG] Schema validation failed for '{config_attribute}': {error.message}")
+
+    return error.message if error is not None else None
+
+
+# Sections that are sorted alphabetically in the final config
+SORTED_SECTIONS = [
+    "settings",
+    "webhooks",
+    "plex",
+    "tmdb",
+    "tautulli",
+    "github",
+    "omdb",
+    "mdblist",
+    "notifiarr",
+    "gotify",
+    "ntfy",
+    "anidb",
+    "radarr",
+    "sonarr",
+    "trakt",
+    "mal",
+]
+
+# Number of dumped section fragments kept in memory
+FRAGMENT_CACHE_SIZE = int(os.getenv("QS_FRAGMENT_CACHE_SIZE", "256"))
+
+_fragment_cache_lock = threading.Lock()
+_fragment_cache = OrderedDict()  # hash of (title, section, data) -> YAML fragment
+_dump_local = threading.local()
+
+
+def get_dump_yaml():
+    """Return this thread's YAML dumper; it is configured once instead of on every section (dumping is not thread-safe)."""
+    dump_yaml = getattr(_dump_local, "yaml", None)
+    if dump_yaml is None:
         dump_yaml = YAML()
         dump_yaml.default_flow_style = False
         dump_yaml.sort_keys = False  # Preserve original key order
@@ -826,94 +397,115 @@ def build_config(header_style="standard", config_name=None):
             type(None),
             lambda self, _: self.represent_scalar("tag:yaml.org,2002:null", ""),
         )
+        _dump_local.yaml = dump_yaml
+    return dump_yaml
 
-        def clean_data(obj):
-            if isinstance(obj, dict):
-                # Sort specific sections alphabetically
-                if dump_name in [
-                    "settings",
-                    "webhooks",
-                    "plex",
-                    "tmdb",
-                    "tautulli",
-                    "github",
-                    "omdb",
-                    "mdblist",
-                    "notifiarr",
-                    "gotify",
-                    "ntfy",
-                    "anidb",
-                    "radarr",
-                    "sonarr",
-                    "trakt",
-                    "mal",
-                ]:
-                    obj = dict(sorted(obj.items()))  # Alphabetically sort keys in the section
-                return {k: clean_data(v) for k, v in obj.items() if k != "valid"}
-            elif isinstance(obj, list):
-                return [clean_data(v) for v in obj]
-            else:
-                return obj
-
-        # Clean the data
-        cleaned_data = clean_data(data)
-
-        # Ensure `asset_directory` is serialized as a proper YAML list
-        if dump_name == "settings" and "asset_directory" in cleaned_data.get("settings", {}):
-            if isinstance(cleaned_data["settings"]["asset_directory"], str):
-                # Convert multi-line string into a list
-                cleaned_data["settings"]["asset_directory"] = [line.strip() for line in cleaned_data["settings"]["asset_directory"].splitlines() if line.strip()]
-            elif isinstance(cleaned_data["settings"]["asset_directory"], list):
-                # Ensure all list items are strings
-                cleaned_data["settings"]["asset_directory"] = [str(i).strip() for i in cleaned_data["settings"]["asset_directory"]]
-
-        # Dump the cleaned data to YAML
-        with io.StringIO() as stream:
-            dump_yaml.dump(cleaned_data, stream)
-            return f"{title}\n{stream.getvalue().strip()}\n\n"
-
-    ordered_sections = [
-        ("libraries", "025-libraries"),
-        ("playlist_files", "027-playlist_files"),
-        ("settings", "150-settings"),
-        ("webhooks", "140-webhooks"),
-        ("plex", "010-plex"),
-        ("tmdb", "020-tmdb"),
-        ("tautulli", "030-tautulli"),
-        ("github", "040-github"),
-        ("omdb", "050-omdb"),
-        ("mdblist", "060-mdblist"),
-        ("notifiarr", "070-notifiarr"),
-        ("gotify", "080-gotify"),
-        ("ntfy", "085-ntfy"),
-        ("anidb", "090-anidb"),
-        ("radarr", "100-radarr"),
-        ("sonarr", "110-sonarr"),
-        ("trakt", "120-trakt"),
-        ("mal", "130-mal"),
-    ]
 
-    # Ensure `code_verifier` is removed from mal.authorization (wherever it exists)
-    if "mal" in config_data and "mal" in config_data["mal"]:
-        authorization_data = config_data["mal"]["mal"].get("authorization", {})
-        authorization_data.pop("code_verifier", None)  # Remove safely
+def clean_fragment(dump_name, data):
+    """Prepare one config section for output: drop the `valid` flags and sort the sections that are sorted."""
 
-    # Apply enforce_string_fields to ensure proper formatting
-    config_data = helpers.enforce_string_fields(config_data, helpers.STRING_FIELDS)
+    def clean_data(obj):
+        if isinstance(obj, dict):
+            # Sort specific sections alphabetically
+            if dump_name in SORTED_SECTIONS:
+                obj = dict(sorted(obj.items()))  # Alphabetically sort keys in the section
+            return {k: clean_data(v) for k, v in obj.items() if k != "valid"}
+        elif isinstance(obj, list):
+            return [clean_data(v) for v in obj]
+        else:
+            return obj
 
-    for section_key, section_stem in ordered_sections:
-        if section_key in config_data:
-            section_data = config_data[section_key]
-            section_art = header_art[section_key]
-            yaml_content += dump_section(section_art, section_key, section_data)
+    # Clean the data
+    cleaned_data = clean_data(data)
+
+    # Ensure `asset_directory` is serialized as a proper YAML list
+    if dump_name == "settings" and "asset_directory" in cleaned_data.get("settings", {}):
+        if isinstance(cleaned_data["settings"]["asset_directory"], str):
+            # Convert multi-line string into a list
+            cleaned_data["settings"]["asset_directory"] = [line.strip() for line in cleaned_data["settings"]["asset_directory"].splitlines() if line.strip()]
+        elif isinstance(cleaned_data["settings"]["asset_directory"], list):
+            # Ensure all list items are strings
+            cleaned_data["settings"]["asset_directory"] = [str(i).strip() for i in cleaned_data["settings"]["asset_directory"]]
+
+    return cleaned_data
+
+
+def dump_section(title, dump_name, data):
+    """Dump one cleaned config section to YAML, preceded by its header art."""
+    with io.StringIO() as stream:
+        get_dump_yaml().dump(data, stream)
+        return f"{title}\n{stream.getvalue().strip()}\n\n"
+
+
+def section_fragment(title, dump_name, data):
+    """
+    Return the dumped YAML of a section, reusing the previous dump when the header art and data are unchanged.
+    The key is order sensitive on purpose: key order in the data is preserved in the output.
+    """
+    key = helpers.calculate_hash(json.dumps([title, dump_name, data], default=str))
+
+    with _fragment_cache_lock:
+        fragment = _fragment_cache.get(key)
+        if fragment is not None:
+            _fragment_cache.move_to_end(key)
+            return fragment
+
+    fragment = dump_section(title, dump_name, data)
+
+    with _fragment_cache_lock:
+        _fragment_cache[key] = fragment
+        while len(_fragment_cache) > FRAGMENT_CACHE_SIZE:
+            _fragment_cache.popitem(last=False)
+
+    return fragment
 
-    validated = False
-    validation_error = None
 
+def render_key(header_style="standard", config_name=None):
+    """
+    Hash everything the rendered config depends on: the revision and content hash of each validated section,
+    the header style, the config name, the Kometa branch and the json-schema file used for validation.
+    """
+    schema_sync.ensure_schema()
     try:
-        jsonschema.validate(yaml.load(yaml_content), schema)
-        validated = True
-    except jsonschema.exceptions.ValidationError as e:
-        validation_error = e
+        stat = os.stat(schema_sync.schema_file_path("config-schema.json"))
+        schema_key = f"{stat.st_mtime_ns}:{stat.st_size}"
+    except OSError:
+        schema_key = "missing"
+
+    parts = [
+        str(config_name),
+        str(header_style),
+        version_check.get_version_info().get("kometa_branch", "nightly"),
+        schema_key,
+    ]
+    for section, progress in sorted(persistence.retrieve_section_progress().items()):
+        if progress["validated"]:
+            parts.append(f"{section}:{progress['revision']}:{progress['content_hash']}")
+
+    return helpers.calculate_hash("\n".join(parts))
+
+
+def render_config(header_style="standard", config_name=None):
+    """
+    Return the RenderedConfig for the current config, only running build_config when one of its inputs changed.
+    """
+    key = render_key(header_style, config_name)
+
+    with _config_cache_lock:
+        rendered = _config_cache.get(key)
+        if rendered is not None:
+            _config_cache.move_to_end(key)
+            return rendered
+
+    rendered = RenderedConfig(key, *build_config(header_style, config_name=config_name))
+
+    with _config_cache_lock:
+        _config_cache[key] = rendered
+        _config_cache.move_to_end(key)
+        while len(_config_cache) > CONFIG_CACHE_SIZE:
+            _config_cache.popitem(last=False)
+
+    if app.config["QS_DEBUG"]:
+        print(f"[DEBUG] Rendered config '{config_name}' ({key[:12]})")
 
-    return validated, validation_error, config_data, yaml_content
+    return rendered
@@ -1,12 +1,65 @@
+import copy
 import os
 import secrets
+import threading
+from types import MappingProxyType
 
 from flask import current_app as app
-from flask import session
+from flask import g, has_request_context, session
 from ruamel.yaml import YAML
 from ruamel.yaml.constructor import DuplicateKeyError  # noqa
 
-from modules import database, helpers, iso
+from modules import database, helpers, schema_sync
+
+_config_template_lock = threading.Lock()
+_config_template = None  # (file stat key, {section: data})
+
+
+def get_settings_snapshot():
+    """
+    Load every section of the current config once per request and keep it on flask.g.
+    Returns {section: (validated, user_entered, data)}; the data must not be modified by callers.
+    """
+    name = session["config_name"]
+    snapshot = g.get("settings_snapshot")
+    if snapshot is None or snapshot[0] != name:
+        snapshot = (name, database.retrieve_all_section_data(name))
+        g.settings_snapshot = snapshot
+    return snapshot[1]
+
+
+def get_status_snapshot():
+    """
+    Return {section: (validated, user_entered)} for the current config, once per request.
+    Taken from the settings snapshot when it is already loaded, otherwise from the status index without reading any data.
+    """
+    name = session["config_name"]
+    settings_snapshot = g.get("settings_snapshot")
+    if settings_snapshot is not None and settings_snapshot[0] == name:
+        return {section: row[:2] for section, row in settings_snapshot[1].items()}
+
+    snapshot = g.get("status_snapshot")
+    if snapshot is None or snapshot[0] != name:
+        snapshot = (name, database.retrieve_section_status(name))
+        g.status_snapshot = snapshot
+    return snapshot[1]
+
+
+def invalidate_settings_snapshot():
+    """Drop the request's settings and status snapshots after a write so later reads see the new data."""
+    if has_request_context():
+        g.pop("settings_snapshot", None)
+        g.pop("status_snapshot", None)
+
+
+def retrieve_section(section_name):
+    """Return (validated, user_entered, data) for a section of the current config from the request snapshot."""
+    return get_settings_snapshot().get(section_name, (False, False, None))
+
+
+def retrieve_section_progress(name=None):
+    """Return the validated/user_entered flags and last save time of each section, keyed by section name."""
+    return database.retrieve_section_progress(name or session["config_name"])
 
 
 def extract_names(raw_source):
@@ -112,7 +165,7 @@ def save_settings(raw_source, form_data):
     user_entered = data != base_data
     validated = data.get("validated", False)
 
-    database.save_section_data(
+    written = database.save_section_data(
         name=session["config_name"],
         section=source_name,
         validated=validated,
@@ -121,17 +174,38 @@ def save_settings(raw_source, form_data):
     )
 
     # Confirm successful save
-    if app.config["QS_DEBUG"]:
-        print(f"[DEBUG] Data saved successfully.")
+    if written:
+        invalidate_settings_snapshot()
+        if app.config["QS_DEBUG"]:
+            print(f"[DEBUG] Data saved successfully.")
+    elif app.config["QS_DEBUG"]:
+        print(f"[DEBUG] Data unchanged for '{source_name}', skipping write.")
+
+    return written
+
+
+def save_sections(name, sections):
+    """
+    Save several sections of a config at once, e.g. {"plex": (validated, user_entered, data)}, in one transaction.
+    Returns the names of the sections that changed.
+    """
+    written = database.save_sections_bulk(name, sections)
+    if written:
+        invalidate_settings_snapshot()
+        if app.config["QS_DEBUG"]:
+            print(f"[DEBUG] Saved sections for '{name}': {', '.join(written)}")
+    return written
 
 
-def get_stored_plex_credentials(name):
-    """Retrieve stored Plex URL & token from the database."""
+def get_stored_plex_credentials(name=None):
+    """Retrieve stored Plex URL & token for a config from the database."""
     try:
-        settings = retrieve_settings(name)  # Fetch full settings
-        plex_settings = settings.get("plex", {})  # Extract nested 'plex' dictionary
-        plex_url = plex_settings.get("url")  # Correct key inside 'plex'
-        plex_token = plex_settings.get("token")  # Correct key inside 'plex'
+        if not name:
+            name = session["config_name"]
+
+        # Only the two values are extracted from the stored JSON, the rest of the section is never decoded
+        plex_url = database.retrieve_section_value(name, "plex", "$.plex.url")
+        plex_token = database.retrieve_section_value(name, "plex", "$.plex.token")
 
         if plex_url and plex_token:
             return plex_url, plex_token
@@ -143,44 +217,44 @@ def get_stored_plex_credentials(name):
     return None, None
 
 
-def update_stored_plex_libraries(name, movie_libraries, show_libraries, music_libraries):
-    """Update the stored Plex libraries in the database and preserve `validated`."""
-    try:
-        # Fetch existing settings from DB before updating
-        settings_before = retrieve_settings(name)
-        if app.config["QS_DEBUG"]:
-            print("[DEBUG] Settings before update:", settings_before)
+def library_set(raw_libraries):
+    """Turn a stored comma separated library string into a set of library names."""
+    if not isinstance(raw_libraries, str):
+        return set()
+    return {lib.strip() for lib in raw_libraries.split(",") if lib.strip()}
 
-        if "plex" not in settings_before:
-            settings_before["plex"] = {}
 
-        # Preserve `validated` status
-        validated_before = settings_before.get("validated", True)
+def update_stored_plex_libraries(name, movie_libraries, show_libraries, music_libraries):
+    """
+    Update the stored Plex libraries for a config while preserving `validated` and `user_entered`.
+    The row is only rewritten when the library set actually changed; returns True if it was written.
+    """
+    try:
+        validated, user_entered, data = database.retrieve_section_data(name=name, section="plex")
+        data = data or {}
+        plex_settings = data.setdefault("plex", {})
 
-        # Update library data
-        settings_before["plex"]["tmp_movie_libraries"] = ",".join(movie_libraries) if movie_libraries else ""
-        settings_before["plex"]["tmp_show_libraries"] = ",".join(show_libraries) if show_libraries else ""
-        settings_before["plex"]["tmp_music_libraries"] = ",".join(music_libraries) if music_libraries else ""
+        updated_libraries = {
+            "tmp_movie_libraries": ",".join(movie_libraries) if movie_libraries else "",
+            "tmp_show_libraries": ",".join(show_libraries) if show_libraries else "",
+            "tmp_music_libraries": ",".join(music_libraries) if music_libraries else "",
+        }
 
-        # Convert to a format that `save_settings()` expects
-        settings_formatted = settings_before["plex"]  # Pass only the `plex` section
+        if all(library_set(plex_settings.get(key)) == library_set(value) for key, value in updated_libraries.items()):
+            if app.config["QS_DEBUG"]:
+                print(f"[DEBUG] Plex libraries unchanged for '{name}', skipping write")
+            return False
 
-        # Restore `validated` before saving
-        settings_formatted["validated"] = validated_before  # Prevents losing validation state
+        plex_settings.update(updated_libraries)
 
         if app.config["QS_DEBUG"]:
-            print(f"[DEBUG] Sending updated Plex settings to save_settings(): {settings_formatted}")
-
-        # Corrected function call (use "010-plex" as the raw_source)
-        save_settings("010-plex", settings_formatted)  # Pass only `plex` settings, not full config
+            print(f"[DEBUG] Saving updated Plex libraries for '{name}': {updated_libraries}")
 
-        # Fetch updated settings from DB after updating
-        settings_after = retrieve_settings(name)
-        if app.config["QS_DEBUG"]:
-            print("[DEBUG] Settings after update:", settings_after)
+        return bool(save_sections(name, {"plex": (validated, user_entered, data)}))
 
     except Exception as e:
         print(f"[ERROR] Failed to update Plex libraries in DB: {e}")
+        return False
 
 
 def retrieve_settings(target):
@@ -192,14 +266,15 @@ def retrieve_settings(target):
     # source will be `010-plex`
     # source_name will be `plex`
 
-    # Fetch stored data from DB
-    db_data = database.retrieve_section_data(name=session["config_name"], section=source_name)
+    # Fetch stored data from the request's settings snapshot
+    db_data = retrieve_section(source_name)
     # db_data is a tuple of validated, user_entered, data
 
     # Extract validation flags
     data["validated"] = helpers.booler(db_data[0])
     data["user_entered"] = helpers.booler(db_data[1])
-    data[source_name] = db_data[2].get(source_name, {}) if db_data[2] else {}
+    # Copy the section so callers can modify it without touching the shared snapshot
+    data[source_name] = copy.deepcopy(db_data[2].get(source_name, {})) if db_data[2] else {}
 
     if not data[source_name]:
         data[source_name] = get_dummy_data(source_name)
@@ -218,9 +293,6 @@ def retrieve_settings(target):
                 data[source_name][prefix][variable] = data[source_name].pop(key)
 
     data["code_verifier"] = secrets.token_urlsafe(100)[:128]
-    data["iso_639_1_languages"] = [(la.alpha2, la.name) for la in iso.languages]
-    data["iso_3166_1_regions"] = [(c.alpha2, c.name) for c in iso.countries]
-    data["iso_639_2_languages"] = [(la.alpha3, la.name) for la in iso.languages]
 
     return data
 
@@ -232,8 +304,8 @@ def retrieve_status(target):
     # source will be `010-plex`
     # source_name will be `plex`
 
-    db_data = database.retrieve_section_data(name=session["config_name"], section=source_name)
-    # db_data is a tuple of validated, user_entered, data
+    db_data = get_status_snapshot().get(source_name, (False, False))
+    # db_data is a tuple of validated, user_entered
 
     validated = helpers.booler(db_data[0])
     user_entered = helpers.booler(db_data[1])
@@ -241,24 +313,49 @@ def retrieve_status(target):
     return validated, user_entered
 
 
-def get_dummy_data(target):
+def load_config_template():
     """
-    Load dummy data from config.yml.template while handling duplicate keys gracefully.
+    Parse config.yml.template once and keep the top-level sections in memory.
+    The cache is keyed on the file's stat, so a new copy written by the schema sync is picked up automatically.
     """
+    global _config_template
 
-    yaml = YAML(typ="safe", pure=True)  # Safe loading mode
+    template_path = os.path.join(helpers.JSON_SCHEMA_DIR, "config.yml.template")
+    stat = os.stat(template_path)
+    file_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
 
-    helpers.ensure_json_schema()
+    cached = _config_template
+    if cached and cached[0] == file_key:
+        return cached[1]
 
-    try:
-        with open(os.path.join(helpers.JSON_SCHEMA_DIR, "config.yml.template"), "r") as file:
-            base_config = yaml.load(file)
-    except DuplicateKeyError as e:
-        print(f"[WARNING] Duplicate key detected in config.yml.template: {e}")
-        return {}  # Return empty data instead of crashing
+    with _config_template_lock:
+        if _config_template and _config_template[0] == file_key:
+            return _config_template[1]
+
+        yaml = YAML(typ="safe", pure=True)  # Safe loading mode
+
+        try:
+            with open(template_path, "r") as file:
+                base_config = yaml.load(file) or {}
+        except DuplicateKeyError as e:
+            print(f"[WARNING] Duplicate key detected in config.yml.template: {e}")
+            base_config = {}  # Return empty data instead of crashing
+
+        sections = MappingProxyType(dict(base_config))
+        _config_template = (file_key, sections)
+        return sections
+
+
+def get_dummy_data(target):
+    """
+    Load dummy data from config.yml.template while handling duplicate keys gracefully.
+    Callers get their own copy of the cached section, so they are free to modify it.
+    """
+
+    schema_sync.ensure_schema()
 
     # Safely retrieve target data
-    return base_config.get(target, {})
+    return copy.deepcopy(load_config_template().get(target, {}))
 
 
 def check_minimum_settings():
@@ -275,6 +372,7 @@ def flush_session_storage(name):
         name = session["config_name"]
     [session.pop(key) for key in list(session.keys()) if not key.startswith("config_name")]
     database.reset_data(name)
+    invalidate_settings_snapshot()
 
 
 def notification_systems_available():
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+from flask import current_app as app
+from plexapi.server import PlexServer
+
+from modules import persistence
+
+# How long a config's Plex library list is trusted before it is re-fetched in the background
+PLEX_LIBRARY_TTL = int(os.getenv("QS_PLEX_LIBRARY_TTL", "300"))
+PLEX_TIMEOUT = 10
+
+# Plex section type -> key used in the sync result
+LIBRARY_TYPES = {
+    "movie": "movie_libraries",
+    "show": "show_libraries",
+    "artist": "music_libraries",
+}
+
+_lock = threading.Lock()
+_library_cache = {}  # config_name -> {"libraries": {...} or None, "refreshed_at": monotonic time}
+_in_flight = set()
+
+
+def fetch_plex_libraries(plex_url, plex_token):
+    """Fetch movie, show and music library titles from Plex with a single sections() call."""
+    plex = PlexServer(plex_url, plex_token, timeout=PLEX_TIMEOUT)
+
+    libraries = {key: [] for key in LIBRARY_TYPES.values()}
+    for section in plex.library.sections():
+        key = LIBRARY_TYPES.get(section.type)
+        if key:
+            libraries[key].append(section.title)
+
+    return libraries
+
+
+def is_stale(config_name):
+    """Return True when the library list for this config has not been synced within the TTL."""
+    with _lock:
+        entry = _library_cache.get(config_name)
+        return entry is None or time.monotonic() - entry["refreshed_at"] >= PLEX_LIBRARY_TTL
+
+
+def invalidate(config_name):
+    """Forget the cached library list so the next page load re-syncs it."""
+    with _lock:
+        _library_cache.pop(config_name, None)
+
+
+def _mark_refreshed(config_name, libraries):
+    with _lock:
+        _library_cache[config_name] = {"libraries": libraries, "refreshed_at": time.monotonic()}
+
+
+def sync_libraries(config_name):
+    """
+    Fetch the library list from Plex for a config and persist it when the library set changed.
+    Returns (libraries, changed); libraries is None when the stored credentials are missing or placeholders.
+    """
+    plex_url, plex_token = persistence.get_stored_plex_credentials(config_name)
+
+    # Skip configs still using the default placeholder values from config.yml.template
+    dummy_plex_config = persistence.get_dummy_data("plex")
+    if not plex_url or not plex_token or plex_url == dummy_plex_config.get("url", "") or plex_token == dummy_plex_config.get("token", ""):
+        _mark_refreshed(config_name, None)
+        return None, False
+
+    libraries = fetch_plex_libraries(plex_url, plex_token)
+    changed = persistence.update_stored_plex_libraries(
+        config_name,
+        libraries["movie_libraries"],
+        libraries["show_libraries"],
+        libraries["music_libraries"],
+    )
+    _mark_refreshed(config_name, libraries)
+
+    if app.config["QS_DEBUG"]:
+        print(f"[DEBUG] Plex libraries synced for '{config_name}' (changed: {changed}): {libraries}")
+
+    return libraries, changed
+
+
+def _background_sync(flask_app, config_name):
+    try:
+        with flask_app.app_context():
+            sync_libraries(config_name)
+    except Exception as e:
+        print(f"[ERROR] Background Plex library sync failed for '{config_name}': {e}")
+        # Back off for a full TTL instead of retrying on every page load
+        with _lock:
+            entry = _library_cache.get(config_name, {})
+        _mark_refreshed(config_name, entry.get("libraries"))
+    finally:
+        with _lock:
+            _in_flight.discard(config_name)
+
+
+def refresh_in_background(config_name):
+    """Start a background sync for this config if its library list is stale. Never blocks the request."""
+    if not config_name or not is_stale(config_name):
+        return False
+
+    with _lock:
+        if config_name in _in_flight:
+            return False
+        _in_flight.add(config_name)
+
+    flask_app = app._get_current_object()  # noqa
+    threading.Thread(
+        target=_background_sync,
+        args=(flask_app, config_name),
+        name=f"plex-sync-{config_name}",
+        daemon=True,
+    ).start()
+    return True
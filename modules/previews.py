@@ -0,0 +1,355 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from PIL import Image, features
+
+from modules import helpers
+
+PREVIEW_SIZE = (1000, 1500)
+PREVIEW_FORMAT = "png"
+OVERLAY_FOLDER = os.path.join(helpers.MEIPASS_DIR, "static", "images", "overlays")
+PREVIEW_FOLDER = os.path.join(helpers.CONFIG_DIR, "previews")
+VARIANT_FOLDER = os.path.join(PREVIEW_FOLDER, "variants")
+
+# Widths offered through ?w=; requests are rounded up to one of these so only a few variants exist per image
+THUMBNAIL_WIDTHS = (150, 300, 500)
+WEBP_SUPPORTED = features.check("webp")
+VARIANT_MIMETYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+VARIANT_SAVE_OPTIONS = {"webp": {"quality": 80, "method": 4}, "jpeg": {"quality": 85}}
+
+# Rendered previews are named after a hash of their inputs; only these files are immutable
+PREVIEW_NAME_PATTERN = re.compile(r"^[0-9a-f]{32}\.png$")
+
+# Number of decoded overlay layers and resized base images kept in memory, least recently used ones are evicted first
+OVERLAY_CACHE_SIZE = int(os.getenv("QS_OVERLAY_CACHE_SIZE", "64"))
+BASE_IMAGE_CACHE_SIZE = int(os.getenv("QS_BASE_IMAGE_CACHE_SIZE", "16"))
+HASH_CACHE_SIZE = 256
+# Total bytes kept in the previews folder; the least recently used files are deleted first once it is exceeded
+PREVIEW_CACHE_MAX_SIZE = int(os.getenv("QS_PREVIEW_CACHE_MAX_SIZE", str(256 * 1024 * 1024)))
+VARIANT_CACHE_MAX_SIZE = int(os.getenv("QS_VARIANT_CACHE_MAX_SIZE", str(128 * 1024 * 1024)))
+
+_lock = threading.Lock()
+_overlay_names = None
+_overlay_cache = OrderedDict()  # overlay name -> ((left, top), cropped RGBA layer), or None for a blank layer
+_base_cache = OrderedDict()  # (path, mtime) -> RGBA base image at PREVIEW_SIZE
+_hash_cache = OrderedDict()  # (path, mtime, size) -> sha256 of the file
+_producing_locks = {}  # cache key -> lock held while it is produced, so concurrent previews decode or render it once
+_gc_lock = threading.Lock()
+_folder_sizes = {}  # folder -> bytes in it, scanned once and then tracked
+
+
+def _cache_get(cache, key):
+    with _lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return True, cache[key]
+    return False, None
+
+
+def _cache_put(cache, key, value, max_size):
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+@contextmanager
+def producing(key):
+    """Hold the lock for producing one cache entry; callers check the cache again once they have it."""
+    with _lock:
+        key_lock = _producing_locks.setdefault(key, threading.Lock())
+    try:
+        with key_lock:
+            yield
+    finally:
+        with _lock:
+            _producing_locks.pop(key, None)
+
+
+def get_overlay_names():
+    """Return the names of the bundled overlays; they never change while Quickstart runs."""
+    global _overlay_names
+
+    with _lock:
+        if _overlay_names is None:
+            files = os.listdir(OVERLAY_FOLDER) if os.path.isdir(OVERLAY_FOLDER) else []
+            _overlay_names = frozenset(os.path.splitext(f)[0] for f in files if f.endswith(".png"))
+        return _overlay_names
+
+
+def get_overlay(name):
+    """
+    Return an overlay as ((left, top), layer), decoded once and cropped to its visible pixels,
+    or None for unknown or blank overlays.
+    """
+    if name not in get_overlay_names():
+        return None
+
+    found, layer = _cache_get(_overlay_cache, name)
+    if found:
+        return layer
+
+    with producing(("overlay", name)):
+        found, layer = _cache_get(_overlay_cache, name)
+        if not found:
+            with Image.open(os.path.join(OVERLAY_FOLDER, f"{name}.png")) as image:
+                image = image.convert("RGBA")
+
+            # The overlays are full-size canvases with a small badge on them; only keep the badge
+            bbox = image.getchannel("A").getbbox()
+            layer = (bbox[:2], image.crop(bbox)) if bbox else None
+
+            _cache_put(_overlay_cache, name, layer, OVERLAY_CACHE_SIZE)
+
+    return layer
+
+
+def get_base_image(path):
+    """Return the base image as RGBA at PREVIEW_SIZE, resized once per (path, mtime). Callers must not modify it."""
+    key = (path, os.stat(path).st_mtime_ns)
+
+    found, image = _cache_get(_base_cache, key)
+    if found:
+        return image
+
+    with producing(key):
+        found, image = _cache_get(_base_cache, key)
+        if not found:
+            with Image.open(path) as source:
+                image = source.convert("RGBA")
+
+            # Ensure base image is 1000x1500
+            if image.size != PREVIEW_SIZE:
+                image = image.resize(PREVIEW_SIZE, Image.LANCZOS)  # noqa
+
+            _cache_put(_base_cache, key, image, BASE_IMAGE_CACHE_SIZE)
+
+    return image
+
+
+def render_preview(base_image_path, overlays):
+    """Composite the overlays, in order, over a copy of the base image."""
+    image = get_base_image(base_image_path).copy()
+
+    for overlay in overlays:
+        layer = get_overlay(overlay)
+        if layer is not None:
+            offset, pixels = layer
+            image.alpha_composite(pixels, dest=offset)
+
+    return image
+
+
+def touch(path):
+    """Mark a cached file as recently used for collect_garbage; the mtime (and so the ETag) is left alone."""
+    stat = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+
+
+def file_hash(path):
+    """Return the sha256 of a file, only reading it again when its mtime or size changed."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    found, digest = _cache_get(_hash_cache, key)
+    if found:
+        return digest
+
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    digest = sha256.hexdigest()
+
+    _cache_put(_hash_cache, key, digest, HASH_CACHE_SIZE)
+    return digest
+
+
+def preview_filename(base_image_path, overlays):
+    """Name a preview after the base image content, the ordered overlays that exist and the output size/format."""
+    layers = [overlay for overlay in overlays if overlay in get_overlay_names()]
+    key = json.dumps([file_hash(base_image_path), layers, PREVIEW_SIZE, PREVIEW_FORMAT])
+    return f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.{PREVIEW_FORMAT}"
+
+
+def get_preview(base_image_path, overlays):
+    """
+    Return (filename, hit) of the preview in PREVIEW_FOLDER, rendering it only when no library or tab
+    asked for the same base image and overlays before.
+    """
+    filename = preview_filename(base_image_path, overlays)
+    preview_path = os.path.join(PREVIEW_FOLDER, filename)
+
+    with producing(preview_path):
+        try:
+            touch(preview_path)
+            return filename, True
+        except FileNotFoundError:
+            pass
+
+        # Write under a temporary name so a request never serves a half-written file
+        temp_path = f"{preview_path}.{threading.get_ident()}.tmp"
+        render_preview(base_image_path, overlays).save(temp_path, format=PREVIEW_FORMAT)
+        os.replace(temp_path, preview_path)
+
+    collect_garbage(PREVIEW_FOLDER, PREVIEW_CACHE_MAX_SIZE, os.path.getsize(preview_path))
+    return filename, False
+
+
+def collect_garbage(folder=PREVIEW_FOLDER, max_size=PREVIEW_CACHE_MAX_SIZE, added=0):
+    """
+    Delete the least recently used files from a cache folder once it is over max_size, down to 90% of it
+    so the folder is not rescanned on every new file. Returns the number of files deleted.
+    """
+    with _gc_lock:
+        if folder not in _folder_sizes:
+            _folder_sizes[folder] = sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+        else:
+            _folder_sizes[folder] += added
+
+        if _folder_sizes[folder] <= max_size:
+            return 0
+
+        entries = []
+        for entry in os.scandir(folder):
+            # Keep the grey placeholder and files that are still being written
+            if entry.is_file() and entry.name != "default.png" and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_atime_ns, stat.st_size, entry.path))
+        entries.sort()
+
+        _folder_sizes[folder] = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if _folder_sizes[folder] <= max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            _folder_sizes[folder] -= size
+            removed += 1
+
+    if removed:
+        print(f"[INFO] Removed {removed} unused image(s) from {folder}")
+    return removed
+
+
+def thumbnail_width(width):
+    """Round a requested ?w= up to the nearest offered thumbnail width, or None for full size."""
+    if not width or width <= 0:
+        return None
+    return next((offered for offered in THUMBNAIL_WIDTHS if width <= offered), None)
+
+
+def find_variant(path, width=None, webp=False):
+    """
+    Work out which file to send for a request: returns (path, mimetype, ready). That is the file itself
+    (mimetype None) or its WebP and/or thumbnail variant in VARIANT_FOLDER; ready is False when the variant
+    still has to be generated with get_variant.
+    """
+    width = thumbnail_width(width)
+    webp = webp and WEBP_SUPPORTED
+    if width is None and not webp:
+        return path, None, True
+
+    if webp:
+        image_format = "webp"
+    else:
+        image_format = "jpeg" if path.lower().endswith((".jpg", ".jpeg")) else "png"
+
+    stat = os.stat(path)
+    key = hashlib.sha256(f"{path}:{stat.st_mtime_ns}:{stat.st_size}:{width}:{image_format}".encode("utf-8")).hexdigest()[:32]
+    variant_path = os.path.join(VARIANT_FOLDER, f"{key}.{image_format}")
+
+    try:
+        touch(variant_path)
+        return variant_path, VARIANT_MIMETYPES[image_format], True
+    except FileNotFoundError:
+        return variant_path, VARIANT_MIMETYPES[image_format], False
+
+
+def get_variant(path, width=None, webp=False):
+    """
+    Return (path, mimetype) of the image to send: the file itself, or a WebP and/or thumbnail variant of it
+    that is generated once and kept in VARIANT_FOLDER. The mimetype is None when the file itself is sent.
+    """
+    variant_path, mimetype, ready = find_variant(path, width, webp)
+    if ready:
+        return variant_path, mimetype
+
+    width = thumbnail_width(width)
+    image_format = os.path.splitext(variant_path)[1][1:]
+
+    with producing(variant_path):
+        # Another request may have generated it while this one waited
+        try:
+            touch(variant_path)
+            return variant_path, mimetype
+        except FileNotFoundError:
+            pass
+
+        try:
+            with Image.open(path) as source:
+                image = source.convert("RGB" if image_format == "jpeg" else "RGBA")
+        except OSError as e:
+            print(f"[WARNING] Could not create a variant of {path}: {e}")
+            return path, None
+
+        if width is not None and width < image.width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)  # noqa
+        elif image_format != "webp":
+            return path, None  # Already smaller than the thumbnail and no conversion asked for
+
+        # Write under a temporary name so a concurrent request never serves a half-written file
+        os.makedirs(VARIANT_FOLDER, exist_ok=True)
+        temp_path = f"{variant_path}.{threading.get_ident()}.tmp"
+        image.save(temp_path, format=image_format, **VARIANT_SAVE_OPTIONS.get(image_format, {}))
+        os.replace(temp_path, variant_path)
+
+    collect_garbage(VARIANT_FOLDER, VARIANT_CACHE_MAX_SIZE, os.path.getsize(variant_path))
+    return variant_path, mimetype
+
+
+def save_library_image(content, save_folder, filename, allowed_formats=None):
+    """
+    Validate a library poster (1:1.5 aspect ratio), resize it to PREVIEW_SIZE and save it under filename,
+    or filename_1, filename_2... when that is taken. Returns the filename used.
+    Raises ValueError with a message for the user when the image cannot be used.
+    """
+    img = Image.open(io.BytesIO(content))
+
+    # Validate the actual file type
+    if allowed_formats is not None and (img.format or "").lower() not in allowed_formats:
+        raise ValueError("Invalid file type. Allowed: png, jpg, jpeg, webp")
+
+    # Ensure the correct aspect ratio
+    if not helpers.is_valid_aspect_ratio(img):
+        raise ValueError("Image must have a 1:1.5 aspect ratio (e.g., 1000x1500).")
+
+    # Resize if necessary
+    if img.size != PREVIEW_SIZE:
+        img = img.resize(PREVIEW_SIZE, Image.LANCZOS)  # noqa
+
+    os.makedirs(save_folder, exist_ok=True)
+
+    # Prevent overwriting existing files
+    base, ext = os.path.splitext(filename)
+    save_path = os.path.join(save_folder, filename)
+    counter = 1
+    while os.path.exists(save_path):
+        filename = f"{base}_{counter}{ext}"
+        save_path = os.path.join(save_folder, filename)
+        counter += 1
+
+    # Save the validated and resized image
+    img.save(save_path)
+    return filename
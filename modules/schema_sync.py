@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from modules import helpers
+
+# Minimum number of seconds between two checks against GitHub
+SCHEMA_SYNC_INTERVAL = int(os.getenv("QS_SCHEMA_SYNC_INTERVAL", "3600"))
+SCHEMA_SYNC_TIMEOUT = 10
+
+# Local file name -> path inside the Kometa repository
+SCHEMA_FILES = {
+    "prototype_config.yml": "json-schema/prototype_config.yml",
+    "config-schema.json": "json-schema/config-schema.json",
+    "config.yml.template": "config/config.yml.template",
+}
+
+# ETag / Last-Modified of the last download of each file, kept next to file_hashes.txt
+VALIDATORS_FILE = "file_validators.json"
+
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_last_sync = None
+_sync_thread = None
+
+
+def schema_file_path(filename):
+    return os.path.join(helpers.JSON_SCHEMA_DIR, filename)
+
+
+def schema_files_present():
+    return all(os.path.exists(schema_file_path(filename)) for filename in SCHEMA_FILES)
+
+
+def _write_atomic(file_path, content):
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(temp_path, file_path)
+
+
+def load_validators():
+    """Load the stored ETag/Last-Modified headers of the schema files."""
+    validators_path = schema_file_path(VALIDATORS_FILE)
+    if not os.path.exists(validators_path):
+        return {}
+    try:
+        with open(validators_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_validators(validators):
+    """Save the ETag/Last-Modified headers of the schema files."""
+    _write_atomic(schema_file_path(VALIDATORS_FILE), json.dumps(validators, indent=2))
+
+
+def _fetch(url, validators):
+    """Conditionally download one file. Returns (content, validators); content is None when unchanged."""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = requests.get(url, headers=headers, timeout=SCHEMA_SYNC_TIMEOUT)
+    if response.status_code == 304:
+        return None, validators
+
+    response.raise_for_status()
+    return response.text, {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def sync_schema_files():
+    """
+    Download the json-schema files in parallel, skipping unchanged ones via conditional requests.
+    Returns the list of files that were rewritten on disk.
+    """
+    global _last_sync
+
+    # branch = helpers.get_kometa_branch()
+    branch = "nightly"
+
+    with _sync_lock:
+        previous_hashes = helpers.load_previous_hashes()
+        validators = load_validators()
+        new_hashes = dict(previous_hashes)
+        written = []
+
+        with ThreadPoolExecutor(max_workers=len(SCHEMA_FILES)) as executor:
+            futures = {}
+            for filename, remote_path in SCHEMA_FILES.items():
+                url = f"{helpers.GITHUB_BASE_URL}/{branch}/{remote_path}"
+                # Never send validators for a file we no longer have, a 304 would leave us without it
+                file_validators = validators.get(filename, {}) if os.path.exists(schema_file_path(filename)) else {}
+                futures[executor.submit(_fetch, url, file_validators)] = (filename, url)
+
+            for future in as_completed(futures):
+                filename, url = futures[future]
+                try:
+                    new_content, validators[filename] = future.result()
+                except requests.RequestException as e:
+                    print(f"[ERROR] Failed to download {filename} from {url}: {e}")
+                    continue  # Keep serving the local copy
+
+                if new_content is None:
+                    continue  # Not modified since the last download
+
+                new_hash = helpers.calculate_hash(new_content)
+                file_path = schema_file_path(filename)
+
+                # Compare hash with previous version
+                if previous_hashes.get(filename) == new_hash and os.path.exists(file_path):
+                    continue
+
+                _write_atomic(file_path, new_content)
+                new_hashes[filename] = new_hash
+                written.append(filename)
+
+        helpers.save_hashes(new_hashes)
+        save_validators(validators)
+
+    # A failed first download leaves no schema to fall back on, so keep retrying until the files exist
+    if schema_files_present():
+        with _lock:
+            _last_sync = time.monotonic()
+
+    if written:
+        print(f"[INFO] Updated json-schema files: {', '.join(sorted(written))}")
+
+    return written
+
+
+def is_sync_due():
+    with _lock:
+        return _last_sync is None or time.monotonic() - _last_sync >= SCHEMA_SYNC_INTERVAL
+
+
+def _background_sync():
+    global _last_sync
+
+    try:
+        sync_schema_files()
+    except Exception as e:
+        print(f"[ERROR] Background json-schema sync failed: {e}")
+        if schema_files_present():
+            with _lock:
+                _last_sync = time.monotonic()  # Keep serving the local copy for a full interval before trying again
+
+
+def start_background_sync():
+    """Start a background sync unless one is already running."""
+    global _sync_thread
+
+    with _lock:
+        if _sync_thread is None or not _sync_thread.is_alive():
+            _sync_thread = threading.Thread(target=_background_sync, name="schema-sync", daemon=True)
+            _sync_thread.start()
+        return _sync_thread
+
+
+def ensure_schema():
+    """
+    Make sure the json-schema files exist, refreshing them at most once per SCHEMA_SYNC_INTERVAL.
+    Only the very first run (no local copy yet) waits for the download; otherwise the local copy is
+    served while the refresh happens in the background.
+    """
+    if not is_sync_due():
+        return
+
+    if schema_files_present():
+        start_background_sync()
+    else:
+        sync_schema_files()
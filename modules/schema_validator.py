@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import jsonschema
+
+from modules import helpers, schema_sync
+
+SCHEMA_FILE = "config-schema.json"
+
+# Number of per-section validation results kept in memory, least recently used ones are evicted first
+VALIDATION_CACHE_SIZE = int(os.getenv("QS_VALIDATION_CACHE_SIZE", "256"))
+
+_lock = threading.Lock()
+_schema_key = None
+_validator = None  # validates whole documents against config-schema.json
+_root_validator = None  # the same schema with every known section accepted as-is
+_sensitive_keys = frozenset()  # property names the schema marks as secret
+_section_cache = OrderedDict()  # hash of (section, fragment) -> list of ValidationError
+_saved_errors = {}  # (config name, section) -> (content hash of the saved data, error message)
+
+
+def get_schema_key():
+    """Identify the config-schema.json on disk; schema_sync replaces the file atomically whenever it changes."""
+    try:
+        stat = os.stat(schema_sync.schema_file_path(SCHEMA_FILE))
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+    except OSError:
+        return None
+
+
+def find_sensitive_keys(schema):
+    """Collect the property names the schema marks as secret (writeOnly, or format: password)."""
+    keys = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            properties = node.get("properties")
+            if isinstance(properties, dict):
+                for key, prop in properties.items():
+                    if isinstance(prop, dict) and (prop.get("writeOnly") or prop.get("format") == "password"):
+                        keys.add(key)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(schema)
+    return frozenset(keys)
+
+
+def compile_validators():
+    """
+    Load config-schema.json and build a validator for it, plus one that only checks the top level.
+    Returns (validator, root validator, sensitive keys).
+    """
+    with open(schema_sync.schema_file_path(SCHEMA_FILE), "r", encoding="utf-8") as file:
+        schema = json.load(file)
+
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+
+    # Sections are checked (and cached) on their own, so the top level only needs to know which keys exist
+    root_schema = dict(schema)
+    root_schema["properties"] = {section: True for section in schema.get("properties", {})}
+    return validator, validator.evolve(schema=root_schema), find_sensitive_keys(schema)
+
+
+def get_validators():
+    """
+    Return the (validator, root validator) pair for the current config-schema.json.
+    Both are kept in memory, along with their $ref resolvers, and only rebuilt when the schema sync rewrote the file.
+    """
+    global _schema_key, _validator, _root_validator, _sensitive_keys
+
+    schema_sync.ensure_schema()
+    schema_key = get_schema_key()
+
+    with _lock:
+        if _validator is None or schema_key != _schema_key:
+            _validator, _root_validator, _sensitive_keys = compile_validators()
+            _schema_key = schema_key
+            _section_cache.clear()
+            _saved_errors.clear()
+        return _validator, _root_validator
+
+
+def get_sensitive_keys():
+    """Return the property names config-schema.json marks as secret, for helpers.redact_sensitive_data."""
+    get_validators()
+    with _lock:
+        return _sensitive_keys
+
+
+def section_errors(section, fragment):
+    """Return the schema errors of one section fragment, e.g. {"plex": {...}}, reusing the result for unchanged fragments."""
+    validator, _ = get_validators()
+    key = helpers.calculate_hash(json.dumps([section, fragment], default=str))
+
+    with _lock:
+        errors = _section_cache.get(key)
+        if errors is not None:
+            _section_cache.move_to_end(key)
+            return errors
+
+    # Only keep errors below the section itself; top-level rules (such as required sections) are checked on the full config
+    errors = [error for error in validator.iter_errors(fragment) if list(error.absolute_path)[:1] == [section]]
+
+    with _lock:
+        _section_cache[key] = errors
+        while len(_section_cache) > VALIDATION_CACHE_SIZE:
+            _section_cache.popitem(last=False)
+
+    return errors
+
+
+def validate_section(section, fragment):
+    """Return the most relevant schema error of one section fragment, or None when it is valid."""
+    return jsonschema.exceptions.best_match(section_errors(section, fragment))
+
+
+def validate_config(document):
+    """
+    Validate the in-memory config, section by section, without round-tripping it through YAML.
+    Returns the most relevant ValidationError, or None when the config is valid.
+    """
+    _, root_validator = get_validators()
+
+    errors = list(root_validator.iter_errors(document))
+    for section, data in document.items():
+        errors.extend(section_errors(section, {section: data}))
+
+    return jsonschema.exceptions.best_match(errors)
+
+
+def record_saved_section(config_name, section, content_hash, error):
+    """Remember the schema error (if any) of a section as it was saved, for the Jump-To menu."""
+    with _lock:
+        if error is None:
+            _saved_errors.pop((config_name, section), None)
+        else:
+            _saved_errors[(config_name, section)] = (content_hash, error.message)
+
+
+def saved_section_error(config_name, section, content_hash):
+    """Return the schema error recorded when this exact section content was saved, or None."""
+    with _lock:
+        saved = _saved_errors.get((config_name, section))
+    if saved and saved[0] == content_hash:
+        return saved[1]
+    return None
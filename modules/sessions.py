@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask_session.base import ServerSideSession, ServerSideSessionInterface
+
+from modules import database, helpers
+
+SESSION_DB_FILE = "sessions.sqlite"
+
+# Encoded values larger than this are stored in their own row and only rewritten when they change
+LARGE_VALUE_THRESHOLD = int(os.getenv("QS_SESSION_LARGE_VALUE", "16384"))
+# Total bytes kept for all sessions; the sessions closest to expiry are evicted first once it is exceeded
+MAX_STORAGE_SIZE = int(os.getenv("QS_SESSION_MAX_SIZE", str(64 * 1024 * 1024)))
+# Expired sessions are evicted lazily, on average every N requests, a batch at a time
+CLEANUP_N_REQUESTS = int(os.getenv("QS_SESSION_CLEANUP_N_REQUESTS", "50"))
+EVICTION_BATCH_SIZE = 100
+
+SQL_CREATE_SESSIONS = """CREATE TABLE IF NOT EXISTS sessions (
+    store_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    large_keys INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    expiry INTEGER NOT NULL
+)"""
+SQL_CREATE_SESSIONS_EXPIRY = """CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions(expiry)"""
+SQL_CREATE_SESSION_VALUES = """CREATE TABLE IF NOT EXISTS session_values (
+    store_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value_hash TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (store_id, key)
+) WITHOUT ROWID"""
+
+SQL_SELECT_SESSION = """SELECT data, large_keys from sessions where store_id == ? AND expiry > ?"""
+SQL_SELECT_LARGE_VALUES = """SELECT key, value from session_values where store_id == ?"""
+SQL_UPSERT_SESSION = """INSERT INTO sessions(store_id, data, large_keys, size, expiry) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(store_id) DO UPDATE SET
+        data = excluded.data,
+        large_keys = excluded.large_keys,
+        size = excluded.size,
+        expiry = excluded.expiry"""
+SQL_UPSERT_LARGE_VALUE = """INSERT INTO session_values(store_id, key, value_hash, value) VALUES (?, ?, ?, ?)
+    ON CONFLICT(store_id, key) DO UPDATE SET
+        value_hash = excluded.value_hash,
+        value = excluded.value
+    WHERE session_values.value_hash IS NOT excluded.value_hash"""
+SQL_DELETE_STALE_LARGE_VALUES = """DELETE from session_values
+    where store_id == ? AND key NOT IN (SELECT value FROM json_each(?))"""
+SQL_DELETE_SESSION = """DELETE from sessions where store_id == ?"""
+SQL_DELETE_SESSION_VALUES = """DELETE from session_values where store_id == ?"""
+SQL_DELETE_EXPIRED = """DELETE from sessions where store_id IN (
+    SELECT store_id from sessions where expiry <= ? ORDER BY expiry LIMIT ?)"""
+SQL_DELETE_OLDEST = """DELETE from sessions where store_id IN (
+    SELECT store_id from sessions ORDER BY expiry LIMIT ?)"""
+SQL_DELETE_ORPHAN_VALUES = """DELETE from session_values where store_id NOT IN (SELECT store_id from sessions)"""
+SQL_TOTAL_SIZE = """SELECT COALESCE(SUM(size), 0) from sessions"""
+
+_local = threading.local()
+_create_lock = threading.Lock()
+_created_path = None
+
+
+def get_session_database_path():
+    return os.path.join(helpers.CONFIG_DIR, SESSION_DB_FILE)
+
+
+def get_connection():
+    """Return this thread's connection to the session database, creating the tables on first use."""
+    global _created_path
+
+    path = get_session_database_path()
+    connection = getattr(_local, "connection", None)
+    if connection is None or _local.path != path:
+        connection = sqlite3.connect(path)
+        connection.row_factory = sqlite3.Row
+        for pragma in database.CONNECTION_PRAGMAS:
+            connection.execute(pragma)
+
+        with _create_lock:
+            if _created_path != path:
+                connection.execute("PRAGMA journal_mode = WAL")
+                with connection:
+                    connection.execute(SQL_CREATE_SESSIONS)
+                    connection.execute(SQL_CREATE_SESSIONS_EXPIRY)
+                    connection.execute(SQL_CREATE_SESSION_VALUES)
+                _created_path = path
+
+        _local.connection = connection
+        _local.path = path
+    return connection
+
+
+class SQLiteSession(ServerSideSession):
+    pass
+
+
+class SQLiteSessionInterface(ServerSideSessionInterface):
+    """
+    Stores server-side sessions in SQLite, next to quickstart.sqlite.
+    Expiry is indexed and evicted lazily in batches; values above LARGE_VALUE_THRESHOLD (such as the rendered
+    YAML) live in their own rows and are only rewritten when their content changes.
+    """
+
+    session_class = SQLiteSession
+    ttl = False
+
+    def __init__(self, app, permanent=True, cleanup_n_requests=CLEANUP_N_REQUESTS):
+        super().__init__(app, permanent=permanent, cleanup_n_requests=cleanup_n_requests)
+
+    def _retrieve_session_data(self, store_id):
+        connection = get_connection()
+        row = connection.execute(SQL_SELECT_SESSION, (store_id, int(time.time()))).fetchone()
+        if row is None:
+            return None
+
+        data = self.serializer.decode(row["data"])
+        if row["large_keys"]:
+            for value_row in connection.execute(SQL_SELECT_LARGE_VALUES, (store_id,)).fetchall():
+                data[value_row["key"]] = self.serializer.decoder.decode(value_row["value"])
+        return data
+
+    def _delete_session(self, store_id):
+        connection = get_connection()
+        with connection:
+            connection.execute(SQL_DELETE_SESSION, (store_id,))
+            connection.execute(SQL_DELETE_SESSION_VALUES, (store_id,))
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        expiry = int(time.time() + session_lifetime.total_seconds())
+
+        # Split off the large values so the session row itself stays small
+        small_values = {}
+        large_values = {}
+        for key, value in session.items():
+            encoded = self.serializer.encoder.encode(value)
+            if len(encoded) > LARGE_VALUE_THRESHOLD:
+                large_values[key] = encoded
+            else:
+                small_values[key] = value
+
+        data = self.serializer.encode(small_values)
+        size = len(data) + sum(len(value) for value in large_values.values())
+
+        connection = get_connection()
+        with connection:
+            connection.execute(SQL_UPSERT_SESSION, (store_id, data, len(large_values), size, expiry))
+            for key, encoded in large_values.items():
+                connection.execute(SQL_UPSERT_LARGE_VALUE, (store_id, key, hashlib.sha256(encoded).hexdigest(), encoded))
+            connection.execute(SQL_DELETE_STALE_LARGE_VALUES, (store_id, json.dumps(list(large_values))))
+
+    def _delete_expired_sessions(self):
+        """Evict one batch of expired sessions, and one batch of the sessions closest to expiry when over MAX_STORAGE_SIZE."""
+        connection = get_connection()
+        with connection:
+            evicted = connection.execute(SQL_DELETE_EXPIRED, (int(time.time()), EVICTION_BATCH_SIZE)).rowcount
+
+            if connection.execute(SQL_TOTAL_SIZE).fetchone()[0] > MAX_STORAGE_SIZE:
+                evicted += connection.execute(SQL_DELETE_OLDEST, (EVICTION_BATCH_SIZE,)).rowcount
+
+            if evicted:
+                connection.execute(SQL_DELETE_ORPHAN_VALUES)
+
+        if evicted and self.app.config["QS_DEBUG"]:
+            print(f"[DEBUG] Evicted {evicted} stored session(s)")
@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from modules import helpers
+
+# How long a remote version check stays fresh (defaults to 24 hours)
+VERSION_CHECK_TTL = int(os.getenv("QS_VERSION_CHECK_TTL", "86400"))
+
+_lock = threading.Lock()
+_version_info = None
+_update_thread = None
+
+
+def get_version_info():
+    """
+    Return the cached version info without touching the network.
+    Until the background thread completes its first check, only local details are reported.
+    """
+    global _version_info
+
+    with _lock:
+        if _version_info is not None:
+            return _version_info
+
+    local_info = helpers.check_for_update(check_remote=False)
+    local_info["last_checked"] = None
+
+    with _lock:
+        if _version_info is None:
+            _version_info = local_info
+        return _version_info
+
+
+def refresh_version_info():
+    """Run a full version check against GitHub and store the result in the cache."""
+    global _version_info
+
+    version_info = helpers.check_for_update()
+    version_info["last_checked"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    with _lock:
+        _version_info = version_info
+
+    return version_info
+
+
+def _update_loop():
+    while True:
+        try:
+            refresh_version_info()
+            print("[INFO] Checked for updates.")
+        except Exception as e:
+            print(f"[ERROR] Version check failed: {e}")
+
+        time.sleep(VERSION_CHECK_TTL)
+
+
+def start_update_thread():
+    """Start the background version checker once per process and return its thread."""
+    global _update_thread
+
+    with _lock:
+        if _update_thread is None or not _update_thread.is_alive():
+            _update_thread = threading.Thread(target=_update_loop, name="version-check", daemon=True)
+            _update_thread.start()
+        return _update_thread
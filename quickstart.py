@@ -5,19 +5,17 @@ import signal
 import socket
 import subprocess
 import sys
-import threading
 import time
 import webbrowser
-from io import BytesIO
 from threading import Thread
 
 import namesgenerator
 import requests
 from PIL import Image
-from cachelib.file import FileSystemCache
 from dotenv import load_dotenv
 from flask import (
     Flask,
+    abort,
     jsonify,
     render_template,
     request,
@@ -26,13 +24,12 @@ from flask import (
     flash,
     session,
     send_file,
-    send_from_directory,
 )
 from waitress import serve
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 
-from flask_session import Session
-from modules import validations, output, persistence, helpers, database
+from modules import validations, output, persistence, helpers, database, image_worker, iso, plex_libraries, previews, schema_sync, schema_validator, sessions, version_check
 
 load_dotenv(os.path.join(helpers.CONFIG_DIR, ".env"), override=True)
 
@@ -42,8 +39,7 @@ UPLOAD_FOLDER_SHOW = os.path.join(UPLOAD_FOLDER, "shows")
 os.makedirs(UPLOAD_FOLDER_MOVIE, exist_ok=True)
 os.makedirs(UPLOAD_FOLDER_SHOW, exist_ok=True)
 IMAGES_FOLDER = os.path.join(helpers.MEIPASS_DIR, "static", "images")
-OVERLAY_FOLDER = os.path.join(IMAGES_FOLDER, "overlays")
-PREVIEW_FOLDER = os.path.join(helpers.CONFIG_DIR, "previews")
+PREVIEW_FOLDER = previews.PREVIEW_FOLDER
 os.makedirs(PREVIEW_FOLDER, exist_ok=True)
 
 GITHUB_MASTER_VERSION_URL = "https://raw.githubusercontent.com/Kometa-Team/Quickstart/master/VERSION"
@@ -53,42 +49,48 @@ basedir = os.path.abspath
 
 app = Flask(__name__)
 
-# Run version check at startup
-app.config["VERSION_CHECK"] = helpers.check_for_update()
+# Start the background version checker (it refreshes the cached version info every TTL)
+update_thread = version_check.start_update_thread()
 
 
-def start_update_thread():
-    """Ensure update_checker_loop runs inside the Flask app context."""
-    with app.app_context():
-        while True:
-            app.config["VERSION_CHECK"] = helpers.check_for_update()
-            time.sleep(86400)  # Sleep for 24 hours
+@app.context_processor
+def inject_version_info():
+    """Inject the cached version info into templates without hitting GitHub"""
+    return {"version_info": version_check.get_version_info()}
 
 
-# Start the background version checker safely
-threading.Thread(target=start_update_thread, daemon=True).start()
+@app.context_processor
+def inject_iso_options_url():
+    """Let templates point <select> elements at the cacheable ISO option lists"""
 
+    def iso_options_url(list_name):
+        return url_for("iso_option_list", version=iso.get_snapshot().version, list_name=list_name)
 
-@app.context_processor
-def inject_version_info():
-    """Ensure latest version info is injected dynamically in templates"""
-    return {"version_info": helpers.check_for_update()}
+    return {"iso_options_url": iso_options_url}
 
 
 # Use booler() for FLASK_DEBUG conversion
 app.config["QS_DEBUG"] = helpers.booler(os.getenv("QS_DEBUG", "0"))
 app.config["QUICKSTART_DOCKER"] = helpers.booler(os.getenv("QUICKSTART_DOCKER", "0"))
 
-app.config["SESSION_TYPE"] = "cachelib"
-app.config["SESSION_CACHELIB"] = FileSystemCache(cache_dir="flask_session", threshold=500)
+# Server-side sessions are kept in SQLite (config/sessions.sqlite) with lazy, batched eviction
 app.config["SESSION_PERMANENT"] = True
-app.config["SESSION_USE_SIGNER"] = False
-
-server_session = Session(app)
+app.session_interface = sessions.SQLiteSessionInterface(app)
 server_thread = None
 
-# Ensure json-schema files are up to date at startup
-helpers.ensure_json_schema()
+# Ensure json-schema files exist at startup (refreshed in the background when a local copy is present)
+schema_sync.ensure_schema()
+
+# Create or upgrade the SQLite schema (and switch it to WAL) once, before any request touches it
+database.migrate()
+
+# Load the bundled ISO datasets (and their option lists) once at startup; optionally refresh them from GitHub in the background
+iso.get_snapshot()
+if helpers.booler(os.getenv("QS_ISO_REFRESH", "0")):
+    iso.start_background_refresh()
+
+# Preload the bundled figlet fonts and render every section heading in the background
+output.start_header_warmup(app)
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif", "bmp"}
 
@@ -146,36 +148,70 @@ def rename_library_image():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def send_image(filepath, immutable=False):
+    """
+    Send an image as WebP when the browser asks for it and as a thumbnail for ?w=, with ETag/Last-Modified.
+    Immutable (content-hashed) images may be cached for a year.
+    """
+    webp = any(mimetype == "image/webp" for mimetype, _ in request.accept_mimetypes)
+    width = request.args.get("w", type=int)
+    variant_path, mimetype, ready = previews.find_variant(filepath, width, webp)
+
+    # Missing variants are encoded on the image executor; requests for the same variant share one job
+    if not ready:
+        try:
+            variant_path, mimetype = image_worker.run(previews.get_variant, filepath, width, webp, key=f"variant:{variant_path}", shared=True)
+        except image_worker.QueueFull:
+            return image_worker_busy()
+        except Exception as e:
+            print(f"[WARNING] Could not create a variant of {filepath}, sending the original: {e}")
+            variant_path, mimetype = filepath, None
+
+    response = send_file(variant_path, mimetype=mimetype, max_age=31536000 if immutable else None)
+    response.vary.add("Accept")
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
 @app.route("/config/uploads/<path:filename>")
 def serve_uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    filepath = safe_join(UPLOAD_FOLDER, filename)
+    if filepath is None or not os.path.isfile(filepath):
+        abort(404)
+    return send_image(filepath)
 
 
 @app.route("/config/previews/<path:filename>")
 def serve_previews(filename):
-    return send_from_directory(PREVIEW_FOLDER, filename)
+    filepath = safe_join(PREVIEW_FOLDER, filename)
+    if filepath is None or not os.path.isfile(filepath):
+        abort(404)
+    return send_image(filepath, immutable=bool(previews.PREVIEW_NAME_PATTERN.match(os.path.basename(filepath))))
 
 
-@app.route("/generate_preview", methods=["POST"])
-def generate_preview():
-    data = request.json
-    overlays = data.get("overlays", [])
-    img_type = data.get("type", "movie")  # "movie" or "show"
-    selected_image = data.get("selected_image", "default.png")
-    library_id = data.get("library_id", "default-library")  # Unique identifier for each library
-    upload_folder = UPLOAD_FOLDER_MOVIE if img_type == "movie" else UPLOAD_FOLDER_SHOW
+def image_worker_busy():
+    response = jsonify({"status": "error", "message": "The image worker is busy, please try again."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
 
-    if app.config["QS_DEBUG"]:
-        print(f"[DEBUG] Generating preview for {library_id}, Type: {img_type}, Overlays: {overlays}")
+
+@app.route("/image_worker/metrics")
+def image_worker_metrics():
+    """Queue and render times of the image executor."""
+    return jsonify(image_worker.get_metrics())
+
+
+def get_preview_base_image(img_type, selected_image):
+    """Return the path of the base image for a preview, or None when the selected image does not exist."""
+    upload_folder = UPLOAD_FOLDER_MOVIE if img_type == "movie" else UPLOAD_FOLDER_SHOW
 
     # Ensure preview directory exists
     if not os.path.exists(PREVIEW_FOLDER):
         os.makedirs(PREVIEW_FOLDER)
 
-    # Generate a unique preview filename per library
-    preview_filename = f"{library_id}-{img_type}_preview.png"
-    preview_filepath = os.path.join(PREVIEW_FOLDER, preview_filename)
-
     # First, check if `default.png` exists in `IMAGES_FOLDER`
     default_image_path = os.path.join(IMAGES_FOLDER, "default.png")
 
@@ -195,28 +231,102 @@ def generate_preview():
     else:
         base_image_path = os.path.join(upload_folder, selected_image)
 
-    if not os.path.exists(base_image_path):
+    return base_image_path if os.path.exists(base_image_path) else None
+
+
+@app.route("/generate_preview", methods=["POST"])
+def generate_preview():
+    data = request.json
+    overlays = data.get("overlays", [])
+    img_type = data.get("type", "movie")  # "movie" or "show"
+    selected_image = data.get("selected_image", "default.png")
+    library_id = data.get("library_id", "default-library")  # Unique identifier for each library
+
+    if app.config["QS_DEBUG"]:
+        print(f"[DEBUG] Generating preview for {library_id}, Type: {img_type}, Overlays: {overlays}")
+
+    base_image_path = get_preview_base_image(img_type, selected_image)
+    if base_image_path is None:
         return jsonify({"status": "error", "message": "Selected image not found."}), 400
 
-    base_img = Image.open(base_image_path).convert("RGBA")
+    # Previews are shared by content: the same base image and overlays always map to the same file.
+    # Rendered on the image executor, where a newer request for the same library replaces this one
+    try:
+        preview_filename, hit = image_worker.run(previews.get_preview, base_image_path, overlays, key=f"preview:{library_id}")
+    except image_worker.QueueFull:
+        return image_worker_busy()
+    except image_worker.Superseded:
+        return jsonify({"status": "superseded", "message": "A newer preview was requested for this library."}), 409
+    except Exception as e:
+        # Includes a render that did not finish within QS_IMAGE_JOB_TIMEOUT
+        return jsonify({"status": "error", "message": f"Failed to generate preview: {str(e) or type(e).__name__}"}), 500
+
+    if app.config["QS_DEBUG"]:
+        print(f"[DEBUG] Preview {'reused' if hit else 'saved'} at {os.path.join(PREVIEW_FOLDER, preview_filename)}")
+
+    return jsonify({"status": "success", "preview_url": url_for("serve_preview_image", filename=preview_filename), "cached": hit})
+
+
+@app.route("/generate_previews", methods=["POST"])
+def generate_previews():
+    """
+    Generate the previews of several libraries in one request, e.g. {"previews": [{library_id, type, selected_image, overlays}]}.
+    They are rendered concurrently on the image executor, sharing the decoded base images and overlay layers,
+    and returned in the order they were asked for. Batches larger than the free queue slots are fed in as
+    earlier jobs finish instead of being turned away, for up to QS_IMAGE_JOB_TIMEOUT seconds for the whole batch;
+    previews still waiting for a slot after that are answered with the busy error.
+    """
+    data = request.get_json(silent=True)
+    specs = data.get("previews", []) if isinstance(data, dict) else None
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+        return jsonify({"status": "error", "message": "Expected {\"previews\": [ ... ]} with one object per preview."}), 400
+
+    results = []
+    jobs = []
+    deadline = time.monotonic() + image_worker.IMAGE_JOB_TIMEOUT
 
-    # Ensure base image is 1000x1500
-    base_img = base_img.resize((1000, 1500), Image.LANCZOS)  # noqa
+    for spec in specs:
+        library_id = spec.get("library_id", "default-library")
+        result = {"library_id": library_id}
+        results.append(result)
 
-    # Apply overlays
-    for overlay in overlays:
-        overlay_path = os.path.join(OVERLAY_FOLDER, f"{overlay}.png")
-        if os.path.exists(overlay_path):
-            overlay_img = Image.open(overlay_path).convert("RGBA")
-            base_img.paste(overlay_img, (0, 0), overlay_img)
+        base_image_path = get_preview_base_image(spec.get("type", "movie"), spec.get("selected_image", "default.png"))
+        if base_image_path is None:
+            result.update(status="error", message="Selected image not found.")
+            continue
 
-    # Save the generated preview
-    base_img.save(preview_filepath)
+        try:
+            jobs.append(
+                (
+                    result,
+                    image_worker.submit(
+                        previews.get_preview,
+                        base_image_path,
+                        spec.get("overlays", []),
+                        key=f"preview:{library_id}",
+                        wait=True,
+                        timeout=max(0, deadline - time.monotonic()),
+                    ),
+                )
+            )
+        except image_worker.QueueFull:
+            result.update(status="error", message="The image worker is busy, please try again.")
+
+    for result, job in jobs:
+        try:
+            preview_filename, hit = job.result()
+        except image_worker.Superseded:
+            result.update(status="superseded", message="A newer preview was requested for this library.")
+            continue
+        except Exception as e:
+            result.update(status="error", message=f"Failed to generate preview: {e}")
+            continue
+        result.update(status="success", preview_url=url_for("serve_preview_image", filename=preview_filename), cached=hit)
 
     if app.config["QS_DEBUG"]:
-        print(f"[DEBUG] Preview saved at {preview_filepath}")
+        print(f"[DEBUG] Generated {len(jobs)} of {len(specs)} previews in one batch")
 
-    return jsonify({"status": "success", "preview_url": f"/{preview_filepath}"})
+    return jsonify({"status": "success", "previews": results})
 
 
 @app.route("/config/previews/<filename>")
@@ -227,10 +337,11 @@ def serve_preview_image(filename):
     filepath = os.path.join(PREVIEW_FOLDER, filename)
 
     if os.path.exists(filepath):
-        return send_file(filepath, mimetype="image/png")
+        # Hashed previews never change, browsers can keep them for good
+        return send_image(filepath, immutable=bool(previews.PREVIEW_NAME_PATTERN.match(filename)))
     else:
         print(f"[WARNING] Requested preview image '{filename}' not found. Returning default.")
-        return send_file(os.path.join(IMAGES_FOLDER, "default.png"), mimetype="image/png")
+        return send_image(os.path.join(IMAGES_FOLDER, "default.png"))
 
 
 @app.route("/get_preview_image/<img_type>", methods=["GET"])
@@ -295,39 +406,19 @@ def upload_library_image():
             400,
         )
 
-    # Open and validate image
-    img = Image.open(image)  # noqa
-    if not helpers.is_valid_aspect_ratio(img):
-        return (
-            jsonify(
-                {
-                    "status": "error",
-                    "message": "Image must have a 1:1.5 aspect ratio (e.g., 1000x1500).",
-                }
-            ),
-            400,
-        )
-
-    # Resize if needed
-    img = img.resize((1000, 1500), Image.LANCZOS)  # noqa
-
     # Set save directory
     save_folder = UPLOAD_FOLDER_MOVIE if image_type == "movie" else UPLOAD_FOLDER_SHOW
-    os.makedirs(save_folder, exist_ok=True)
-
-    # Set initial save path **before the loop**
-    save_path = os.path.join(save_folder, filename)
-
-    # Prevent overwriting existing files
-    base, ext = os.path.splitext(filename)
-    counter = 1
-    while os.path.exists(os.path.join(save_folder, filename)):
-        filename = f"{base}_{counter}{ext}"
-        save_path = os.path.join(save_folder, filename)
-        counter += 1
 
-    # Save the validated and resized image
-    img.save(save_path)
+    # Validate, resize and save on the image executor
+    try:
+        filename = image_worker.run(previews.save_library_image, image.read(), save_folder, filename)
+    except image_worker.QueueFull:
+        return image_worker_busy()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        # Includes a job that did not finish within QS_IMAGE_JOB_TIMEOUT
+        return jsonify({"status": "error", "message": f"Processing error: {str(e) or type(e).__name__}"}), 500
 
     return jsonify(
         {
@@ -353,58 +444,17 @@ def fetch_library_image():
     try:
         response = requests.get(image_url, stream=True, timeout=5)
         response.raise_for_status()
-        img = Image.open(BytesIO(response.content))
-
-        # Validate file extension
-        file_extension = img.format.lower()
-        if file_extension not in ALLOWED_EXTENSIONS:
-            return (
-                jsonify(
-                    {
-                        "status": "error",
-                        "message": "Invalid file type. Allowed: png, jpg, jpeg, webp",
-                    }
-                ),
-                400,
-            )
-
-        # Ensure the correct aspect ratio
-        if not helpers.is_valid_aspect_ratio(img):
-            return (
-                jsonify(
-                    {
-                        "status": "error",
-                        "message": "Image must have a 1:1.5 aspect ratio (e.g., 1000x1500).",
-                    }
-                ),
-                400,
-            )
-
-        # Resize if necessary
-        img = img.resize((1000, 1500), Image.LANCZOS)  # noqa
 
         # Set save directory
         save_folder = UPLOAD_FOLDER_MOVIE if image_type == "movie" else UPLOAD_FOLDER_SHOW
-        os.makedirs(save_folder, exist_ok=True)
 
         # Generate a safe filename from URL
         filename = secure_filename(os.path.basename(image_url))
         if "." not in filename or filename.split(".")[-1].lower() not in ALLOWED_EXTENSIONS:
             filename += ".png"  # Default to PNG if no valid extension is found
 
-        # Set initial save path **before the loop**
-        save_path = os.path.join(save_folder, filename)
-
-        # Prevent overwriting existing files
-        base, ext = os.path.splitext(filename)
-        counter = 1
-        while os.path.exists(save_path):
-            filename = f"{base}_{counter}{ext}"
-            save_path = os.path.join(save_folder, filename)
-            counter += 1
-
-        # Save the validated and resized image
-        img.save(save_path)
+        # Validate, resize and save on the image executor
+        filename = image_worker.run(previews.save_library_image, response.content, save_folder, filename, ALLOWED_EXTENSIONS)
 
         return jsonify(
             {
@@ -414,11 +464,15 @@ def fetch_library_image():
             }
         )
 
+    except image_worker.QueueFull:
+        return image_worker_busy()
     except requests.exceptions.RequestException as e:
         return (
             jsonify({"status": "error", "message": f"Failed to fetch image: {str(e)}"}),
             400,
         )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return (
             jsonify({"status": "error", "message": f"Processing error: {str(e)}"}),
@@ -486,6 +540,7 @@ def clear_session():
 @app.route("/clear_data/<name>/<section>")
 def clear_data_section(name, section):
     database.reset_data(name, section)
+    persistence.invalidate_settings_snapshot()
     flash("SQLite storage cleared successfully.", "success")
     return redirect(url_for("start"))
 
@@ -493,6 +548,7 @@ def clear_data_section(name, section):
 @app.route("/clear_data/<name>")
 def clear_data(name):
     database.reset_data(name)
+    persistence.invalidate_settings_snapshot()
     flash("SQLite storage cleared successfully.", "success")
     return redirect(url_for("start"))
 
@@ -503,11 +559,19 @@ def step(name):
     header_style = "standard"  # Default to 'standard' font
 
     if request.method == "POST":
-        persistence.save_settings(request.referrer, request.form)
+        written = persistence.save_settings(request.referrer, request.form)
         header_style = request.form.get("header_style", "standard")
 
-    # Call `refresh_plex_libraries()` BEFORE retrieving Plex settings
-    refresh_plex_libraries()
+        # New Plex credentials mean the cached library list no longer applies
+        if written and persistence.extract_names(request.referrer or "")[1] == "plex":
+            plex_libraries.invalidate(session.get("config_name"))
+
+        # Check the saved section against the json-schema now, the final page reuses the result.
+        # The section is already saved, so a schema problem must not fail the request
+        try:
+            output.validate_saved_section(request.referrer or "", session.get("config_name"))
+        except Exception as e:
+            print(f"[ERROR] Could not validate the saved section against the json-schema: {e}")
 
     # Retrieve available fonts (ensuring "none" and "single line" are always included)
     available_fonts = helpers.get_pyfiglet_fonts()
@@ -563,6 +627,9 @@ def step(name):
     if selected_config not in available_configs:
         page_info["new_config_name"] = selected_config  # Use the new config name
 
+    # Re-sync the Plex library list in the background once it is older than the TTL
+    plex_libraries.refresh_in_background(selected_config)
+
     file_list = helpers.get_menu_list()
     template_list = helpers.get_template_list()
     total_steps = len(template_list)
@@ -576,6 +643,10 @@ def step(name):
         return f"ERROR WITH NAME {name}; stem, num, b: {stem}, {num}, {b}"
 
     page_info["progress"] = round((current_index + 1) / total_steps * 100)
+    # Per-section flags and last save time for the Jump-To menu, read from the status index only
+    page_info["section_progress"] = persistence.retrieve_section_progress(selected_config)
+    for section, progress in page_info["section_progress"].items():
+        progress["schema_error"] = schema_validator.saved_section_error(selected_config, section, progress["content_hash"])
     page_info["title"] = item["name"]
     page_info["next_page"] = item["next"]
     page_info["prev_page"] = item["prev"]
@@ -702,17 +773,19 @@ def step(name):
     # Ensure correct rendering for the final validation page
     config_name = session.get("config_name") or page_info.get("config_name", "default")
     if name == "900-final":
-        validated, validation_error, config_data, yaml_content = output.build_config(header_style, config_name=config_name)
+        # Served from the rendered config cache unless a validated section or the header style changed
+        rendered = output.render_config(header_style, config_name=config_name)
 
-        page_info["yaml_valid"] = validated
-        session["yaml_content"] = yaml_content
+        page_info["yaml_valid"] = rendered.validated
+        # Remember the header style so the downloads render (or reuse) the same config
+        session["config_header_style"] = header_style
 
         return render_template(
             "900-final.html",
             page_info=page_info,
             data=data,
-            yaml_content=yaml_content,
-            validation_error=validation_error,
+            yaml_content=rendered.yaml_content,
+            validation_error=rendered.validation_error,
             template_list=file_list,
             available_configs=available_configs,
         )
@@ -760,36 +833,74 @@ def get_top_imdb_items_route(library_name):
     return jsonify({"status": "success", "items": items, "saved_item": saved_item})
 
 
+@app.route("/check_for_update", methods=["GET", "POST"])
+def check_for_update():
+    """Return the cached version info, or re-check GitHub right now on POST."""
+    if request.method == "POST":
+        version_info = version_check.refresh_version_info()
+    else:
+        version_info = version_check.get_version_info()
+    return jsonify(version_info)
+
+
+@app.route("/api/iso/<version>/<list_name>")
+def iso_option_list(version, list_name):
+    """Serve a precomputed ISO option list; URLs are versioned so the response can be cached forever."""
+    snapshot = iso.get_snapshot()
+    payload = snapshot.option_payloads.get(list_name)
+    if payload is None:
+        return jsonify({"status": "error", "message": f"Unknown ISO list '{list_name}'"}), 404
+
+    # An older snapshot version was requested, point the browser at the current one
+    if version != snapshot.version:
+        return redirect(url_for("iso_option_list", version=snapshot.version, list_name=list_name))
+
+    body, etag = payload
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+def send_rendered_config(content, etag, download_name):
+    """
+    Send a rendered config as a download with a weak ETag, answering 304 when the client already has it.
+    The ETag is the render key, which does not cover the creation time in the header, so a render after a
+    restart or cache eviction can differ in that line while carrying the same key.
+    """
+    response = send_file(
+        io.BytesIO(content.encode("utf-8")),
+        mimetype="text/yaml",
+        as_attachment=True,
+        download_name=download_name,
+        etag=False,
+    )
+    response.set_etag(etag, weak=True)
+    # The config holds credentials: only the browser may keep it, and it has to revalidate every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @app.route("/download")
 def download():
-    yaml_content = session.get("yaml_content", "")
-    if yaml_content:
-        return send_file(
-            io.BytesIO(yaml_content.encode("utf-8")),
-            mimetype="text/yaml",
-            as_attachment=True,
-            download_name="config.yml",
-        )
+    if "config_header_style" in session:
+        rendered = output.render_config(session["config_header_style"], config_name=session.get("config_name"))
+        return send_rendered_config(rendered.yaml_content, rendered.key, "config.yml")
     flash("No configuration to download", "danger")
-    return redirect(request.referrer or url_for("step", page="900-final"))
+    return redirect(request.referrer or url_for("step", name="900-final"))
 
 
 @app.route("/download_redacted")
 def download_redacted():
-    yaml_content = session.get("yaml_content", "")
-    if yaml_content:
-        # Redact sensitive information
-        redacted_content = helpers.redact_sensitive_data(yaml_content)
-
-        # Serve the redacted YAML as a file download
-        return send_file(
-            io.BytesIO(redacted_content.encode("utf-8")),
-            mimetype="text/yaml",
-            as_attachment=True,
-            download_name="config_redacted.yml",
-        )
+    if "config_header_style" in session:
+        # Redacted once when the config was rendered
+        rendered = output.render_config(session["config_header_style"], config_name=session.get("config_name"))
+        return send_rendered_config(rendered.redacted_content, f"{rendered.key}-redacted", "config_redacted.yml")
     flash("No configuration to download", "danger")
-    return redirect(request.referrer or url_for("step", page="900-final"))
+    return redirect(request.referrer or url_for("step", name="900-final"))
 
 
 @app.route("/validate_gotify", methods=["POST"])
@@ -813,20 +924,15 @@ def validate_plex():
 @app.route("/refresh_plex_libraries", methods=["POST"])
 def refresh_plex_libraries():
     try:
-        # Get stored Plex credentials from DB
         config_name = session.get("config_name")  # Ensure the session has config_name
         if not config_name:
             return jsonify({"valid": False, "error": "Missing config_name"}), 400
 
-        plex_url, plex_token = persistence.get_stored_plex_credentials("010-plex")  # Fetch from DB
-
-        # Load default values from config.yml.template
-        dummy_plex_config = persistence.get_dummy_data("plex")  # Retrieves {"url": "...", "token": "..."}
-        default_plex_url = dummy_plex_config.get("url", "")
-        default_plex_token = dummy_plex_config.get("token", "")
+        # Fetch the latest libraries from Plex; the DB is only written if they changed
+        libraries, changed = plex_libraries.sync_libraries(config_name)
 
-        # Exit early if the Plex credentials are still using default placeholder values
-        if not plex_url or not plex_token or plex_url == default_plex_url or plex_token == default_plex_token:
+        # Exit early if the Plex credentials are missing or still using default placeholder values
+        if libraries is None:
             return (
                 jsonify(
                     {
@@ -837,32 +943,7 @@ def refresh_plex_libraries():
                 400,
             )
 
-        # Fetch latest libraries from Plex
-        plex_response = validations.validate_plex_server({"plex_url": plex_url, "plex_token": plex_token})
-
-        # Fix: Convert Flask response object to JSON before accessing data.
-        if isinstance(plex_response, Flask.response_class):
-            plex_data = plex_response.get_json()  # Extract JSON data correctly
-        else:
-            plex_data = plex_response  # If already a dict, use as-is
-
-        if not plex_data.get("validated"):
-            return jsonify({"valid": False, "error": "Plex validation failed"}), 500
-
-        # Extract new library data
-        updated_movie_libraries = plex_data.get("movie_libraries", [])
-        updated_show_libraries = plex_data.get("show_libraries", [])
-        updated_music_libraries = plex_data.get("music_libraries", [])
-
-        # Update the DB with the latest libraries
-        persistence.update_stored_plex_libraries(
-            "010-plex",
-            updated_movie_libraries,
-            updated_show_libraries,
-            updated_music_libraries,
-        )
-
-        return jsonify(plex_data)  # Return refreshed data
+        return jsonify({"validated": True, "changed": changed, **libraries})  # Return refreshed data
 
     except Exception as e:
         return jsonify({"valid": False, "error": f"Server error: {str(e)}"}), 500
@@ -984,22 +1065,11 @@ def shutdown():
 
 
 server_thread = None
-update_thread = None
 if __name__ == "__main__":
 
     def start_flask_app():
         serve(app, host="0.0.0.0", port=port)
 
-    def start_update_thread(app_in):
-        with app_in.app_context():
-            while True:
-                app_in.config["VERSION_CHECK"] = helpers.check_for_update()
-                print("[INFO] Checked for updates.")
-                time.sleep(86400)
-
-    update_thread = threading.Thread(target=start_update_thread, args=(app,), daemon=True)
-    update_thread.start()
-
     def get_lan_ip():
         try:
             # Connect to a dummy address to get the local IP used
@@ -1,5 +1,7 @@
 /* global bootstrap, $ */
 document.addEventListener('DOMContentLoaded', function () {
+  loadIsoOptions()
+
   // Prevent form submission on "Enter" key press, except for textarea
   document.addEventListener('keydown', function (event) {
     if (event.key === 'Enter' && event.target.tagName !== 'TEXTAREA') {
@@ -11,6 +13,31 @@ document.addEventListener('DOMContentLoaded', function () {
   })
 })
 
+// Fill <select data-iso-options="..."> elements from the cached ISO option list endpoints
+function loadIsoOptions () {
+  document.querySelectorAll('select[data-iso-options]').forEach(select => {
+    fetch(select.dataset.isoOptions)
+      .then(response => response.json())
+      .then(data => {
+        const selectedValue = select.value
+
+        // Drop the server-rendered stand-in for the stored value; the full list contains it
+        select.querySelectorAll('option[data-iso-placeholder]').forEach(option => option.remove())
+
+        const existing = new Set(Array.from(select.options).map(option => option.value))
+        const fragment = document.createDocumentFragment()
+        data.options.forEach(([code, name]) => {
+          if (existing.has(code)) return
+          fragment.appendChild(new Option(name, code))
+        })
+        select.appendChild(fragment)
+
+        if (selectedValue) select.value = selectedValue
+      })
+      .catch(error => console.error('[ERROR] Failed to load ISO options:', error))
+  })
+}
+
 // Loading spinner functionality
 function loading (action) {
   console.log('action:', action)
@@ -139,4 +166,32 @@ function showToast (type, message) {
   toast.show()
 }
 
+// Function to re-check GitHub for a newer Quickstart version on demand
+function checkForUpdate () {
+  const button = document.getElementById('check-for-update-btn')
+  if (button) button.disabled = true
+
+  fetch('/check_for_update', { method: 'POST' })
+    .then(response => response.json())
+    .then(versionInfo => {
+      const lastChecked = document.getElementById('version-last-checked')
+      if (lastChecked) lastChecked.textContent = versionInfo.last_checked || 'never'
+
+      if (versionInfo.update_available) {
+        showToast('warning', `A new version of Quickstart (${versionInfo.remote_version}) is available.`)
+      } else if (versionInfo.remote_version) {
+        showToast('success', 'Quickstart is up to date.')
+      } else {
+        showToast('error', 'Unable to reach GitHub to check for updates.')
+      }
+    })
+    .catch(error => {
+      console.error('Error checking for updates:', error)
+      showToast('error', 'Failed to check for updates.')
+    })
+    .finally(() => {
+      if (button) button.disabled = false
+    })
+}
+
 /* eslint-enable no-unused-vars */
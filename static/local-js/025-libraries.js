@@ -1,8 +1,38 @@
-/* global EventHandler, ValidationHandler, Sortable */
+/* global EventHandler, ValidationHandler, Sortable, showSpinner, hideSpinner, showToast, jumpTo */
 
 document.addEventListener('DOMContentLoaded', function () {
   console.log('[DEBUG] Initializing Libraries...')
 
+  const refreshLibrariesButton = document.getElementById('refresh-plex-libraries-btn')
+  if (refreshLibrariesButton) {
+    refreshLibrariesButton.addEventListener('click', function () {
+      refreshLibrariesButton.disabled = true
+      showSpinner('refresh_libraries')
+
+      fetch('/refresh_plex_libraries', { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+          if (!data.validated) {
+            showToast('error', data.error || 'Failed to refresh Plex libraries.')
+          } else if (data.changed) {
+            // Save the current form and reload so the new libraries are rendered
+            showToast('success', 'Plex libraries changed, reloading...')
+            jumpTo('025-libraries')
+          } else {
+            showToast('info', 'Plex libraries are already up to date.')
+          }
+        })
+        .catch(error => {
+          console.error('[ERROR] Failed to refresh Plex libraries:', error)
+          showToast('error', 'Failed to refresh Plex libraries.')
+        })
+        .finally(() => {
+          hideSpinner('refresh_libraries')
+          refreshLibrariesButton.disabled = false
+        })
+    })
+  }
+
   const scriptsToLoad = [
     '/static/local-js/imageHandler.js',
     '/static/local-js/overlayHandler.js',
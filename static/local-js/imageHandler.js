@@ -47,6 +47,11 @@ const ImageHandler = {
       })
   },
 
+  // Preview requests made within this many milliseconds are sent to the server as one batch
+  previewBatchDelay: 50,
+  pendingPreviews: {},
+  previewBatchTimer: null,
+
   generatePreview: function (libraryId, isMovie) {
     console.log(`[DEBUG] Generating preview for Library: ${libraryId}`)
 
@@ -59,31 +64,49 @@ const ImageHandler = {
     const selectedImage = dropdown ? dropdown.value : 'default.png'
     const selectedOverlays = ImageHandler.getLibraryOverlays(libraryId, isMovie)
 
-    fetch('/generate_preview', {
+    // Only the latest request per library is kept until the batch is sent
+    ImageHandler.pendingPreviews[libraryId] = {
+      library_id: libraryId,
+      overlays: selectedOverlays,
+      type: isMovie ? 'movie' : 'show',
+      selected_image: selectedImage
+    }
+
+    clearTimeout(ImageHandler.previewBatchTimer)
+    ImageHandler.previewBatchTimer = setTimeout(ImageHandler.flushPreviews, ImageHandler.previewBatchDelay)
+  },
+
+  flushPreviews: function () {
+    const specs = Object.values(ImageHandler.pendingPreviews)
+    ImageHandler.pendingPreviews = {}
+    if (specs.length === 0) return
+
+    fetch('/generate_previews', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({
-        library_id: libraryId,
-        overlays: selectedOverlays,
-        type: isMovie ? 'movie' : 'show',
-        selected_image: selectedImage
-      })
+      body: JSON.stringify({ previews: specs })
     })
       .then(response => response.json())
       .then(data => {
-        if (data.status === 'success') {
-          const newPreviewURL = `/config/previews/${libraryId}-${isMovie ? 'movie' : 'show'}_preview.png?t=` + new Date().getTime()
-          const previewImage = document.querySelector(`[id="${libraryId}-overlayPreviewImage"]`)
+        (data.previews || []).forEach(preview => {
+          if (preview.status !== 'success') {
+            if (preview.status === 'error') console.error(`[ERROR] Generating overlay preview for ${preview.library_id}: ${preview.message}`)
+            return
+          }
+
+          // Preview URLs are content-addressed, a new overlay selection always gets a new URL
+          const newPreviewURL = `${preview.preview_url}?w=500`
+          const previewImage = document.querySelector(`[id="${preview.library_id}-overlayPreviewImage"]`)
 
           if (previewImage) {
             previewImage.src = newPreviewURL
-            console.log(`[DEBUG] Updated preview image for ${libraryId}: ${newPreviewURL}`)
+            console.log(`[DEBUG] Updated preview image for ${preview.library_id}: ${newPreviewURL}`)
           } else {
-            console.error(`[ERROR] Overlay preview image not found for library ${libraryId}`)
+            console.error(`[ERROR] Overlay preview image not found for library ${preview.library_id}`)
           }
-        }
+        })
       })
-      .catch(error => console.error('[ERROR] Generating overlay preview:', error))
+      .catch(error => console.error('[ERROR] Generating overlay previews:', error))
   },
 
   getLibraryOverlays: function (libraryId, isMovie) {
@@ -197,7 +220,7 @@ const ImageHandler = {
     renameNewNameMovie.style.display = isMovie ? 'block' : 'none'
     renameNewNameShow.style.display = isMovie ? 'none' : 'block'
 
-    renameImagePreview.src = `/config/uploads/${isMovie ? 'movies' : 'shows'}/${selectedImage}`
+    renameImagePreview.src = `/config/uploads/${isMovie ? 'movies' : 'shows'}/${selectedImage}?w=300`
     renameCurrentName.textContent = `Current Name: ${selectedImage}`
     renameNewNameMovie.value = ''
     renameNewNameShow.value = ''
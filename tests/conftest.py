@@ -0,0 +1,14 @@
+import pytest
+
+from modules import database, helpers
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    """
+    Point CONFIG_DIR (and with it the SQLite databases) at an empty temporary folder.
+    database.get_connection() notices the new path and opens (and migrates) a fresh connection.
+    """
+    monkeypatch.setattr(helpers, "CONFIG_DIR", str(tmp_path))
+    monkeypatch.setattr(database, "_migrated_path", None)
+    return tmp_path
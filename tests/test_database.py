@@ -0,0 +1,133 @@
+import json
+import pickle
+import sqlite3
+import zlib
+from contextlib import closing
+
+import pytest
+
+from modules import database
+
+
+def test_retrieve_all_section_data_skips_undecodable_sections(config_dir):
+    database.save_section_data("plex", True, True, {"plex": {"url": "http://plex:32400"}})
+    # What the upgrade leaves behind for a pickle it could not convert: the raw data and no content hash
+    with database.get_connection() as connection:
+        connection.execute(
+            "UPDATE section_data SET data = ?, content_hash = NULL WHERE name == 'default' AND section == 'plex'",
+            (pickle.dumps({"plex": {}})[:-4],),
+        )
+    database.save_section_data("tmdb", True, True, {"tmdb": {"apikey": "abc"}})
+
+    sections = database.retrieve_all_section_data("default")
+
+    assert "plex" not in sections
+    assert sections["tmdb"] == (True, True, {"tmdb": {"apikey": "abc"}})
+    assert database.retrieve_section_data("default", "plex") == (False, False, None)
+    assert database.retrieve_section_value("default", "plex", "$.plex.url") is None
+
+    # Saving the section again replaces the damaged row
+    database.save_section_data("plex", True, True, {"plex": {"url": "http://plex:32400"}})
+    assert database.retrieve_section_value("default", "plex", "$.plex.url") == "http://plex:32400"
+
+
+def create_legacy_database(rows):
+    """Create a quickstart.sqlite as written before schema versioning: pickled data and user_version 0."""
+    with closing(sqlite3.connect(database.get_database_path())) as connection:
+        connection.execute(database.persisted_section_table_create())
+        connection.executemany(
+            "INSERT INTO section_data(name, section, validated, user_entered, data) VALUES (?, ?, ?, ?, ?)",
+            [(name, section, True, True, pickle.dumps(data)) for name, section, data in rows],
+        )
+        connection.commit()
+
+
+def read_schema():
+    with closing(sqlite3.connect(database.get_database_path())) as connection:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(section_data)")]
+        index = [row[2] for row in connection.execute("PRAGMA index_info(section_status)")]
+        rows = {
+            row[0]: row[1:]
+            for row in connection.execute("SELECT section, typeof(data), data, content_hash, revision FROM section_data")
+        }
+    return version, columns, index, rows
+
+
+def test_migrate_upgrades_a_legacy_database(config_dir):
+    small = {"tmdb": {"apikey": "abc", "language": "en"}}
+    large = {"libraries": {f"Library {i}": {"collection_files": [{"default": "basic"}]} for i in range(200)}}
+    create_legacy_database([("default", "tmdb", small), ("default", "libraries", large)])
+
+    database.migrate()
+    version, columns, index, rows = read_schema()
+
+    assert version == database.SCHEMA_VERSION == 4
+    assert columns[-3:] == ["updated_at", "content_hash", "revision"]
+    assert index == ["name", "section", "validated", "user_entered", "updated_at", "revision", "content_hash"]
+
+    # Small sections become JSON text, large ones zlib-compressed JSON; both are hashed and start at revision 1
+    assert rows["tmdb"][0] == "text" and json.loads(rows["tmdb"][1]) == small
+    assert rows["libraries"][0] == "blob" and json.loads(zlib.decompress(rows["libraries"][1])) == large
+    assert rows["tmdb"][2:] == (database.content_hash(small), 1)
+    assert rows["libraries"][2:] == (database.content_hash(large), 1)
+    assert database.retrieve_all_section_data("default") == {"tmdb": (True, True, small), "libraries": (True, True, large)}
+
+    # Running it again on the migrated database changes nothing
+    database._migrated_path = None
+    database.migrate()
+    assert read_schema() == (version, columns, index, rows)
+
+
+def test_migrate_keeps_undecodable_rows(config_dir):
+    create_legacy_database([("default", "tmdb", {"tmdb": {"apikey": "abc"}})])
+    with closing(sqlite3.connect(database.get_database_path())) as connection:
+        connection.execute("INSERT INTO section_data VALUES ('default', 'plex', 1, 1, ?)", (b"\x80\x04damaged",))
+        connection.commit()
+
+    database.migrate()
+    version, _, _, rows = read_schema()
+
+    assert version == 4
+    assert rows["plex"] == ("blob", b"\x80\x04damaged", None, 1)
+    assert rows["tmdb"][0] == "text"
+
+
+def test_migrate_rolls_back_a_failed_upgrade(config_dir, monkeypatch):
+    create_legacy_database([("default", "tmdb", {"tmdb": {"apikey": "abc"}})])
+
+    def fail(connection):
+        raise RuntimeError("conversion failed")
+
+    monkeypatch.setattr(database, "migrate_pickled_data", fail)
+    with pytest.raises(RuntimeError):
+        database.migrate()
+
+    # Nothing of the upgrade is left behind, not even the version 2 column
+    with closing(sqlite3.connect(database.get_database_path())) as connection:
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert [row[1] for row in connection.execute("PRAGMA table_info(section_data)")] == [
+            "name",
+            "section",
+            "validated",
+            "user_entered",
+            "data",
+        ]
+
+    monkeypatch.undo()
+    database.migrate()
+    assert read_schema()[0] == 4
+
+
+def test_migrate_finishes_a_half_applied_upgrade(config_dir):
+    # Left behind by versions whose upgrade was not atomic: the version 2 column exists, user_version is still 0
+    create_legacy_database([("default", "tmdb", {"tmdb": {"apikey": "abc"}})])
+    with closing(sqlite3.connect(database.get_database_path())) as connection:
+        connection.execute("ALTER TABLE section_data ADD COLUMN updated_at TEXT")
+        connection.commit()
+
+    database.migrate()
+
+    version, columns, _, _ = read_schema()
+    assert version == 4
+    assert columns.count("updated_at") == 1
@@ -0,0 +1,25 @@
+from modules import helpers
+
+
+def test_redact_sensitive_data_redacts_lists_under_sensitive_keys():
+    data = {"webhooks": {"error": None, "changes": ["https://discord.com/api/webhooks/123/abc", "https://example.com/hook"]}}
+
+    redacted = helpers.redact_sensitive_data(data)
+
+    assert redacted["webhooks"]["changes"] == [helpers.REDACTED, helpers.REDACTED]
+    assert redacted["webhooks"]["error"] is None
+    assert data["webhooks"]["changes"][0] == "https://discord.com/api/webhooks/123/abc"
+
+
+def test_redact_sensitive_data_redacts_mappings_under_sensitive_keys():
+    data = {"notifiarr": {"apikey": {"primary": "secret-key", "backup": ["other-key", None]}}}
+
+    redacted = helpers.redact_sensitive_data(data)
+
+    assert redacted["notifiarr"]["apikey"] == {"primary": helpers.REDACTED, "backup": [helpers.REDACTED, None]}
+
+
+def test_redact_sensitive_data_keeps_unchanged_sections():
+    data = {"plex": {"timeout": 60, "clean_bundles": False}}
+
+    assert helpers.redact_sensitive_data(data) is data
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from modules import image_worker
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """A fresh image executor with two workers and a queue of three jobs."""
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(image_worker, "_executor", executor)
+    monkeypatch.setattr(image_worker, "_pending", 0)
+    monkeypatch.setattr(image_worker, "_latest", {})
+    monkeypatch.setattr(image_worker, "_newest_sequences", OrderedDict())
+    monkeypatch.setattr(image_worker, "_shared", {})
+    monkeypatch.setattr(image_worker, "_metrics", dict(image_worker._metrics))
+    monkeypatch.setattr(image_worker, "IMAGE_QUEUE_DEPTH", 3)
+    monkeypatch.setattr(image_worker, "IMAGE_JOB_TIMEOUT", 5)
+    yield image_worker
+    executor.shutdown(wait=True)
+
+
+def blocking_job(release, started=None):
+    """A job that runs until release is set; returns a function to submit and the event that ends it."""
+
+    def job(value):
+        if started is not None:
+            started.set()
+        release.wait(5)
+        return value
+
+    return job
+
+
+def test_submit_raises_queue_full_when_the_queue_is_full(worker):
+    release = threading.Event()
+    job = blocking_job(release)
+    jobs = [worker.submit(job, i) for i in range(3)]
+
+    with pytest.raises(worker.QueueFull):
+        worker.submit(job, 3)
+    assert worker.get_metrics()["rejected"] == 1
+
+    release.set()
+    assert [queued.result() for queued in jobs] == [0, 1, 2]
+    assert worker.get_metrics()["pending"] == 0
+
+
+def test_a_newer_job_cancels_the_queued_older_one(worker, monkeypatch):
+    monkeypatch.setattr(image_worker, "IMAGE_QUEUE_DEPTH", 4)
+    release = threading.Event()
+    job = blocking_job(release)
+    blockers = [worker.submit(job, "busy") for _ in range(2)]  # Both workers are busy, the next job waits in the queue
+
+    older = worker.submit(job, "old", key="preview:lib")
+    newer = worker.submit(job, "new", key="preview:lib")
+    assert older.future.cancelled()
+    release.set()
+
+    with pytest.raises(worker.Superseded):
+        older.result()
+    assert newer.result() == "new"
+    assert [blocker.result() for blocker in blockers] == ["busy", "busy"]
+
+
+def test_an_older_job_that_already_ran_is_superseded(worker):
+    older = worker.submit(str.upper, "old", key="preview:lib")
+    older.future.result(5)  # Finished before the newer request came in, but its caller has not collected it yet
+
+    newer = worker.submit(str.upper, "new", key="preview:lib")
+
+    assert newer.result() == "NEW"
+    with pytest.raises(worker.Superseded):
+        older.result()
+
+
+def test_a_slow_older_job_loses_to_a_faster_newer_one(worker):
+    release = threading.Event()
+    started = threading.Event()
+    older = worker.submit(blocking_job(release, started), "old", key="preview:lib")
+    started.wait(5)
+
+    # The newer job runs on the second worker and finishes first; its key entry is cleaned up right away
+    newer = worker.submit(str.upper, "new", key="preview:lib")
+    assert newer.result() == "NEW"
+    assert "preview:lib" not in worker._latest
+
+    release.set()
+    with pytest.raises(worker.Superseded):
+        older.result()
+
+
+def test_shared_jobs_with_the_same_key_run_once(worker):
+    release = threading.Event()
+    calls = []
+
+    def encode(value):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    first = worker.submit(encode, "variant", key="variant:a.webp", shared=True)
+    second = worker.submit(encode, "variant", key="variant:a.webp", shared=True)
+    other = worker.submit(encode, "other", key="variant:b.webp", shared=True)
+
+    assert second.future is first.future
+    assert worker.get_metrics()["pending"] == 2
+
+    release.set()
+    assert (first.result(), second.result(), other.result()) == ("variant", "variant", "other")
+    assert sorted(calls) == ["other", "variant"]
+    assert worker._shared == {}
+
+
+def test_wait_blocks_until_a_slot_frees_up(worker):
+    release = threading.Event()
+    job = blocking_job(release)
+    jobs = [worker.submit(job, i) for i in range(3)]
+
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(worker.submit(str.upper, "late", wait=True)))
+    waiter.start()
+    time.sleep(0.2)
+    assert waiter.is_alive() and not waited  # Still waiting for a slot, not rejected
+
+    release.set()
+    waiter.join(5)
+    assert waited[0].result() == "LATE"
+    assert [queued.result() for queued in jobs] == [0, 1, 2]
+    assert worker.get_metrics()["rejected"] == 0
+
+
+def test_wait_gives_up_after_the_job_timeout(worker, monkeypatch):
+    monkeypatch.setattr(image_worker, "IMAGE_JOB_TIMEOUT", 0.2)
+    release = threading.Event()
+    job = blocking_job(release)
+    jobs = [worker.submit(job, i) for i in range(3)]
+
+    with pytest.raises(worker.QueueFull):
+        worker.submit(str.upper, "late", wait=True)
+
+    release.set()
+    for queued in jobs:
+        queued.result()
+
+
+def test_wait_gives_up_after_the_given_timeout(worker):
+    release = threading.Event()
+    job = blocking_job(release)
+    jobs = [worker.submit(job, i) for i in range(3)]
+
+    started = time.perf_counter()
+    with pytest.raises(worker.QueueFull):
+        worker.submit(str.upper, "late", wait=True, timeout=0.1)
+    assert time.perf_counter() - started < 1  # Not the 5 second IMAGE_JOB_TIMEOUT
+
+    release.set()
+    for queued in jobs:
+        queued.result()
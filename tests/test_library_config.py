@@ -0,0 +1,173 @@
+import io
+import json
+
+from ruamel.yaml import YAML
+
+from modules import library_config
+
+PREFIX = "mov-library_movies"
+
+# The stored form data of one library, covering every kind of operation the wizard offers
+FORM = {
+    f"{PREFIX}-library": "Movies",
+    f"{PREFIX}-collection_basic": True,
+    f"{PREFIX}-collection_imdb": True,
+    f"{PREFIX}-collection_genre": False,
+    f"{PREFIX}-overlay_ribbon": True,
+    f"{PREFIX}-overlay_resolution": False,
+    f"{PREFIX}-overlay_selected_content_rating": "us",
+    f"{PREFIX}-template_variables[use_separator]": "blue",
+    f"{PREFIX}-template_variables[language]": "fr",
+    f"{PREFIX}-attribute_template_variables[placeholder_imdb_id]": "tt0111161",
+    f"{PREFIX}-attribute_assets_for_all": True,
+    f"{PREFIX}-attribute_split_duplicates": False,
+    f"{PREFIX}-attribute_mass_collection_mode": "hide",
+    f"{PREFIX}-attribute_mass_genre_update_order": json.dumps(["tmdb", "imdb"]),
+    f"{PREFIX}-attribute_mass_genre_update_custom": json.dumps(["Thriller", "Action"]),
+    f"{PREFIX}-attribute_mass_content_rating_update_order": json.dumps(["mdb"]),
+    f"{PREFIX}-attribute_mass_content_rating_update_custom_string": " NR ",
+    f"{PREFIX}-attribute_mass_original_title_update_order": json.dumps(["anidb"]),
+    f"{PREFIX}-attribute_mass_original_title_update_custom_string": "Unknown",
+    f"{PREFIX}-attribute_mass_tagline_update_custom_string": "No tagline",
+    f"{PREFIX}-attribute_mass_critic_rating_update_custom_string": "7",
+    f"{PREFIX}-attribute_mass_user_rating_update_custom_string": "bad",
+    f"{PREFIX}-attribute_mass_studio_update_custom": json.dumps(["A24"]),
+    f"{PREFIX}-attribute_mass_added_at_update_order": json.dumps(["tmdb", 5]),
+    f"{PREFIX}-attribute_genre_mapper": json.dumps({"Sci-Fi": "Science Fiction"}),
+    f"{PREFIX}-attribute_content_rating_mapper": "{}",
+    f"{PREFIX}-attribute_metadata_backup_path": "/config/backup.yml",
+    f"{PREFIX}-attribute_metadata_backup_exclude": json.dumps(["Kids"]),
+    f"{PREFIX}-attribute_sync_tags": True,
+    f"{PREFIX}-attribute_add_blank_entries": True,
+    f"{PREFIX}-attribute_mass_poster_update_order": json.dumps(["tmdb"]),
+    f"{PREFIX}-attribute_mass_poster_seasons": True,
+    f"{PREFIX}-attribute_mass_poster_source": "tmdb",
+    f"{PREFIX}-attribute_mass_background_episodes": True,
+    f"{PREFIX}-attribute_delete_collections_managed": True,
+    f"{PREFIX}-attribute_delete_collections_less": 2,
+    f"{PREFIX}-top_level_remove_overlays": True,
+    f"{PREFIX}-top_level_reset_overlays": "tmdb",
+    f"{PREFIX}-top_level_report_path": "/config/report.yml",
+}
+
+# What build_libraries_section produced for FORM before the library model existed
+EXPECTED = {
+    "report_path": "/config/report.yml",
+    "remove_overlays": True,
+    "reset_overlays": "tmdb",
+    "template_variables": {"use_separator": True, "sep_style": "blue", "placeholder_imdb_id": "tt0111161", "language": "fr"},
+    "operations": {
+        "assets_for_all": True,
+        "delete_collections": {"managed": True, "less": 2},
+        "mass_genre_update": ["tmdb", "imdb", ["Thriller", "Action"]],
+        "mass_content_rating_update": ["mdb", "NR"],
+        "mass_original_title_update": ["anidb", "Unknown"],
+        "mass_studio_update": ["A24"],
+        "mass_added_at_update": ["tmdb", 5],
+        "mass_critic_rating_update": [7.0],
+        "mass_poster_update": {"seasons": True, "source": "tmdb"},
+        "mass_background_update": {"episodes": True},
+        "mass_collection_mode": "hide",
+        "genre_mapper": {"Sci-Fi": "Science Fiction"},
+        "metadata_backup": {"path": "/config/backup.yml", "exclude": ["Kids"], "sync_tags": True, "add_blank_entries": True},
+        "mass_tagline_update": ["No tagline"],
+    },
+    "collection_files": [{"default": "basic"}, {"default": "imdb"}],
+    "overlay_files": [{"default": "ribbon"}, {"default": "content_rating_us"}],
+}
+
+# The same entry as the previous build_libraries_section dumped it, which also pins list styles
+EXPECTED_YAML = """\
+report_path: /config/report.yml
+remove_overlays: true
+reset_overlays: tmdb
+template_variables:
+  use_separator: true
+  sep_style: blue
+  placeholder_imdb_id: tt0111161
+  language: fr
+operations:
+  assets_for_all: true
+  delete_collections:
+    managed: true
+    less: 2
+  mass_genre_update:
+  - tmdb
+  - imdb
+  - [Thriller, Action]
+  mass_content_rating_update:
+  - mdb
+  - NR
+  mass_original_title_update:
+  - anidb
+  - Unknown
+  mass_studio_update:
+  - A24
+  mass_added_at_update:
+  - tmdb
+  - 5
+  mass_critic_rating_update:
+  - 7.0
+  mass_poster_update:
+    seasons: true
+    source: tmdb
+  mass_background_update:
+    episodes: true
+  mass_collection_mode: hide
+  genre_mapper:
+    Sci-Fi: Science Fiction
+  metadata_backup:
+    path: /config/backup.yml
+    exclude:
+    - Kids
+    sync_tags: true
+    add_blank_entries: true
+  mass_tagline_update:
+  - No tagline
+collection_files:
+- default: basic
+- default: imdb
+overlay_files:
+- default: ribbon
+- default: content_rating_us
+"""
+
+
+def ordered(value):
+    """Turn mappings into lists of pairs, so comparing two trees also compares their key order."""
+    if isinstance(value, dict):
+        return [(key, ordered(item)) for key, item in value.items()]
+    if isinstance(value, list):
+        return [ordered(item) for item in value]
+    return value
+
+
+def build_entry():
+    groups = library_config.parse_library_keys(FORM)["mov"]["movies"]
+    return library_config.LibraryConfig.from_form("movies", groups["library"]["title"], "mov", groups)
+
+
+def test_library_entry_matches_the_previous_output():
+    entry = build_entry().to_kometa()
+
+    assert ordered(entry) == ordered(EXPECTED)
+
+    buffer = io.StringIO()
+    YAML().dump(entry, buffer)
+    assert buffer.getvalue() == EXPECTED_YAML
+
+
+def test_library_entry_parses_typed_operations():
+    operations = build_entry().operations
+
+    assert operations.assets_for_all is True
+    assert operations.split_duplicates is None
+    assert operations.mass_poster_update == ["tmdb"]
+    assert operations.mass_poster_details == {"seasons": True, "source": "tmdb"}
+    assert operations.mass_user_rating_update == []
+
+
+def test_benchmark_library_times_one_entry():
+    groups = library_config.parse_library_keys(FORM)["mov"]["movies"]
+
+    assert library_config.benchmark_library("movies", "Movies", "mov", groups, rounds=5) > 0
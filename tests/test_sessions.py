@@ -0,0 +1,106 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+from flask import Flask, session
+
+from modules import sessions
+
+
+@pytest.fixture
+def client(config_dir):
+    app = Flask(__name__)
+    app.config["QS_DEBUG"] = False
+    app.session_interface = sessions.SQLiteSessionInterface(app, cleanup_n_requests=None)
+
+    @app.route("/set/<key>/<int:size>")
+    def set_value(key, size):
+        session[key] = "x" * size
+        return "ok"
+
+    @app.route("/get/<key>")
+    def get_value(key):
+        return str(len(session.get(key, "")))
+
+    @app.route("/touch")
+    def touch():
+        session.modified = True
+        return "ok"
+
+    return app.test_client()
+
+
+def query(sql, *args):
+    with closing(sqlite3.connect(sessions.get_session_database_path())) as connection:
+        return connection.execute(sql, args).fetchall()
+
+
+def count_large_value_writes():
+    """Log every insert and update of session_values, to see which saves rewrote a large value."""
+    with closing(sqlite3.connect(sessions.get_session_database_path())) as connection:
+        connection.executescript(
+            """CREATE TABLE value_writes (key TEXT);
+            CREATE TRIGGER value_inserted AFTER INSERT ON session_values BEGIN INSERT INTO value_writes VALUES (new.key); END;
+            CREATE TRIGGER value_updated AFTER UPDATE ON session_values BEGIN INSERT INTO value_writes VALUES (new.key); END;"""
+        )
+
+
+def test_large_values_round_trip_and_are_only_rewritten_when_changed(client):
+    large = sessions.LARGE_VALUE_THRESHOLD + 1000
+    client.get("/set/small/10")
+    count_large_value_writes()
+
+    client.get(f"/set/yaml/{large}")
+    assert client.get("/get/yaml").text == str(large)
+    assert client.get("/get/small").text == "10"
+
+    # The large value lives in its own row and the session row stays small
+    assert query("SELECT key FROM session_values") == [("yaml",)]
+    assert query("SELECT large_keys FROM sessions") == [(1,)]
+    assert query("SELECT length(data) < ? FROM sessions", sessions.LARGE_VALUE_THRESHOLD) == [(1,)]
+
+    # Saving the session again leaves the unchanged large value alone, a new value rewrites it
+    client.get("/touch")
+    assert query("SELECT key FROM value_writes") == [("yaml",)]
+    client.get(f"/set/yaml/{large + 1}")
+    assert query("SELECT key FROM value_writes") == [("yaml",), ("yaml",)]
+    assert client.get("/get/yaml").text == str(large + 1)
+
+    # Once the value is small again its separate row is dropped
+    client.get("/set/yaml/5")
+    assert query("SELECT key FROM session_values") == []
+    assert client.get("/get/yaml").text == "5"
+
+
+def test_expired_sessions_are_evicted_with_their_large_values(client):
+    client.get(f"/set/yaml/{sessions.LARGE_VALUE_THRESHOLD + 1}")
+    with closing(sqlite3.connect(sessions.get_session_database_path())) as connection:
+        connection.execute("UPDATE sessions SET expiry = 0")
+        connection.commit()
+
+    # An expired session is never read back, even before it is evicted
+    assert client.get("/get/yaml").text == "0"
+
+    client.application.session_interface._delete_expired_sessions()
+
+    assert query("SELECT count(*) FROM sessions WHERE expiry = 0") == [(0,)]
+    assert query("SELECT count(*) FROM session_values") == [(0,)]
+
+
+def test_sessions_closest_to_expiry_are_evicted_over_the_size_cap(client, monkeypatch):
+    client.get("/set/value/100")
+    with closing(sqlite3.connect(sessions.get_session_database_path())) as connection:
+        connection.execute("INSERT INTO sessions VALUES ('other', x'00', 0, 100, 4102444800)")
+        connection.commit()
+    [(oldest,)] = query("SELECT store_id FROM sessions ORDER BY expiry LIMIT 1")
+
+    monkeypatch.setattr(sessions, "MAX_STORAGE_SIZE", 150)
+    monkeypatch.setattr(sessions, "EVICTION_BATCH_SIZE", 1)
+    client.application.session_interface._delete_expired_sessions()
+
+    remaining = [store_id for (store_id,) in query("SELECT store_id FROM sessions")]
+    assert remaining == ["other"] and oldest != "other"
+
+    # Under the cap nothing else is evicted
+    client.application.session_interface._delete_expired_sessions()
+    assert query("SELECT store_id FROM sessions") == [("other",)]